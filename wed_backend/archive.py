@@ -0,0 +1,189 @@
+# archive.py
+#
+#   python archive.py run [--days 180] [--batch-size 500] [--pause 0.1]
+#   python archive.py status
+#
+# Hot/cold split. Orders dropped off more than ARCHIVE_AFTER_DAYS ago that
+# have been picked up and fully paid are moved, with their items, payments
+# and status history, into the *_archive tables (models.py). The hot tables then only
+# hold what the counter works with, so every operational query and /stats
+# count stays small; exports and historical reports read both through
+# union_sides(). Run it from cron, e.g. nightly.
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, func, insert, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+import branches, models, versions, workflow
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+BATCH_SIZE = 500
+
+HOT = {
+    "orders": models.Order.__table__,
+    "order_items": models.OrderItem.__table__,
+    "payments": models.Payment.__table__,
+    "order_status_history": models.OrderStatusHistory.__table__,
+}
+COLD = {
+    "orders": models.orders_archive,
+    "order_items": models.order_items_archive,
+    "payments": models.payments_archive,
+    "order_status_history": models.order_status_history_archive,
+}
+# children before orders when deleting, orders first when copying
+CHILD_TABLES = ("order_items", "payments", "order_status_history")
+
+
+# ---------- Moving orders ----------
+
+def _holds_newest(table, key: str):
+    # the order owning the table's highest id
+    column = table.c[key]
+    return select(table.c.order_id).where(column == select(func.max(column)).scalar_subquery())
+
+def candidates_query(cutoff: datetime, batch_size: int):
+    # Oldest first, for every branch at once: old orders sit at the low ids,
+    # so walking the primary key finds a batch quickly. SQLite (and MySQL
+    # before 8.0, after a restart) hands out MAX(id) + 1, which would reuse
+    # an id that is already in the archive: the newest order is never taken,
+    # nor an order owning the newest item, payment or history row (an old
+    # order paid off today).
+    order = models.Order
+    return (
+        select(order.order_id)
+        .where(
+            order.status_id == workflow.PICKED_UP,
+            order.unpaid.is_(False),
+            order.dropoff_datetime < cutoff,
+            order.order_id < select(func.max(order.order_id)).scalar_subquery(),
+            order.order_id.not_in(_holds_newest(HOT["order_items"], "item_id")),
+            order.order_id.not_in(_holds_newest(HOT["payments"], "payment_id")),
+            order.order_id.not_in(_holds_newest(HOT["order_status_history"], "history_id")),
+        )
+        .order_by(order.order_id)
+        .limit(batch_size)
+        .with_for_update()
+    )
+
+def _copy(db: Session, name: str, order_ids: List[int], now: datetime):
+    hot, cold = HOT[name], COLD[name]
+    columns = [c.name for c in hot.columns]
+    source = select(*hot.columns).where(hot.c.order_id.in_(order_ids))
+    if name == "orders":
+        columns.append("archived_at")
+        source = source.add_columns(literal(now, models.orders_archive.c.archived_at.type))
+    db.execute(insert(cold).from_select(columns, source))
+
+def archive_batch(db: Session, order_ids: List[int], now: Optional[datetime] = None):
+    # One transaction: copy the orders and their rows, then delete them from
+    # the hot tables. The caller commits.
+    now = now or datetime.now()
+    _copy(db, "orders", order_ids, now)
+    for name in CHILD_TABLES:
+        _copy(db, name, order_ids, now)
+    for name in CHILD_TABLES + ("orders",):
+        db.execute(delete(HOT[name]).where(HOT[name].c.order_id.in_(order_ids)))
+    versions.bump(db, "orders", "order_items", "payments")
+
+def archive_orders(
+    db: Session,
+    days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = BATCH_SIZE,
+    pause: float = 0.0,
+    max_batches: Optional[int] = None,
+) -> int:
+    # Short transactions of `batch_size` orders each, so counter writes only
+    # ever wait for one batch; `pause` leaves them room between batches.
+    cutoff = datetime.now() - timedelta(days=days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = list(db.execute(candidates_query(cutoff, batch_size)).scalars())
+        if not order_ids:
+            db.rollback()
+            break
+        archive_batch(db, order_ids)
+        db.commit()
+        moved += len(order_ids)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+# ---------- Reading both ----------
+
+def union_sides(build: Callable[[dict], object]):
+    # `build(tables)` returns a select() over HOT- or COLD-shaped tables; the
+    # result is UNION ALL of both, with every filter applied inside each side
+    # so both are served by their own indexes.
+    return union_all(build(HOT), build(COLD))
+
+def ordered(stmt, *columns: str):
+    return stmt.order_by(*[literal_column(name) for name in columns])
+
+def archived_order(db: Session, order_id: int) -> Optional[dict]:
+    # An archived order in the schemas.Order shape, for GET /orders/{id}.
+    # Plain tables, so the session's branch is applied here.
+    stmt = select(models.orders_archive).where(models.orders_archive.c.order_id == order_id)
+    if branches.scope(db) is not None:
+        stmt = stmt.where(models.orders_archive.c.branch_id == branches.scope(db))
+    order = db.execute(stmt).mappings().first()
+    if order is None:
+        return None
+    order = dict(order)
+    order["customer"] = db.execute(
+        select(models.Customer.__table__).where(models.Customer.customer_id == order["customer_id"])
+    ).mappings().first()
+    order["status"] = db.execute(
+        select(models.Status.__table__).where(models.Status.status_id == order["status_id"])
+    ).mappings().first()
+    for name in ("order_items", "payments"):
+        table = COLD[name]
+        rows = db.execute(select(table).where(table.c.order_id == order_id)).mappings().all()
+        order["items" if name == "order_items" else "payments"] = [dict(r) for r in rows]
+    return order
+
+def status_history_query(order_id: int, branch_id: Optional[int] = None):
+    def build(tables):
+        history = tables["order_status_history"]
+        stmt = select(history).where(history.c.order_id == order_id)
+        return stmt if branch_id is None else stmt.where(history.c.branch_id == branch_id)
+    return ordered(union_sides(build), "changed_at", "history_id")
+
+def counts(db: Session) -> dict:
+    return {
+        name: {
+            "hot": db.execute(select(func.count()).select_from(HOT[name])).scalar(),
+            "archived": db.execute(select(func.count()).select_from(COLD[name])).scalar(),
+        }
+        for name in HOT
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python archive.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="move old picked-up orders to the archive tables")
+    run.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    run.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    run.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    commands.add_parser("status", help="hot / archived row counts")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "run":
+            moved = archive_orders(db, args.days, args.batch_size, args.pause)
+            print(f"archived {moved} orders dropped off more than {args.days} days ago")
+        else:
+            for name, count in counts(db).items():
+                print(f"{name:22} hot {count['hot']:>9}  archived {count['archived']:>9}")
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+# async_api.py
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+import branches, schemas, crud_async, versions
+from pagination import Page, set_next_cursor
+from metrics import InstrumentedRoute
+from projection import OrderProjection, dumps
+
+# Async versions of the hot read endpoints. main.py includes this router
+# ahead of its own routes when USE_ASYNC_DB=1, so these handlers take over
+# the same paths; everything else stays on the sync `get_db` path.
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+# ------------------- DB ---------------------
+# Scoped to the request's branch like the sync sessions (branches.py); the
+# async engine only serves the main database, see database.py.
+async def get_async_db(branch_id: int = Depends(branches.get_branch)):
+    async with AsyncSessionLocal(info={"branch_id": branch_id}) as db:
+        await db.run_sync(branches.check_known, branch_id)
+        yield db
+
+# ------------------- CUSTOMERS ---------------
+@router.get("/customers", response_model=List[schemas.Customer])
+async def list_customers(
+    request: Request,
+    response: Response,
+    filters: schemas.CustomerFilter = Depends(),
+    page: Page = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    etag = await crud_async.conditional(db, request, "customers")
+    response.headers.update(versions.etag_headers(etag))
+    rows = await crud_async.get_customers(db, filters, page.cursor, page.limit)
+    return set_next_cursor(response, page, rows, "customer_id")
+
+# ------------------- ORDERS ------------------
+@router.get("/orders", response_model=List[schemas.Order])
+async def list_orders(
+    request: Request,
+    filters: schemas.OrderFilter = Depends(),
+    page: Page = Depends(),
+    projection: OrderProjection = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    etag = await crud_async.conditional(db, request, *versions.ORDER_TABLES)
+    rows = await crud_async.get_order_rows(db, projection, filters, page.cursor, page.limit)
+    response = Response(content=dumps(rows), media_type="application/json", headers=versions.etag_headers(etag))
+    set_next_cursor(response, page, rows, "order_id")
+    return response
+
+@router.get("/orders/pickup_queue")
+async def pickup_queue(limit: int = Query(50, ge=1, le=200), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.pickup_queue(db, limit)
+
+# ------------------- DASHBOARD STATS --------------------
+@router.get("/stats/summary")
+async def stats_summary(db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.summary(db)
+
+
+@router.get("/summary/dashboard")
+async def summary_dashboard(
+    pending_limit: int = Query(20, ge=1, le=100),
+    pickup_limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.dashboard(db, pending_limit, pickup_limit)
+
+
+@router.get("/stats/orders_by_status")
+async def stats_orders_by_status(db: AsyncSession = Depends(get_async_db)):
+    return [
+        {"status": name, "count": count}
+        for _, name, count in await crud_async.status_counts(db)
+    ]
+
+
+@router.get("/stats/revenue_7_days")
+async def stats_revenue_last7(db: AsyncSession = Depends(get_async_db)):
+    return [
+        {"date": day["date"], "amount": day["amount"]}
+        for day in await crud_async.revenue_series(db, days=7)
+    ]
+
+
+@router.get("/stats/revenue_daily")
+async def stats_revenue_daily(
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.revenue_series(db, days=days)
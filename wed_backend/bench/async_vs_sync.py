@@ -0,0 +1,49 @@
+# bench/async_vs_sync.py
+#
+#   cd wed_backend
+#   python -m bench.async_vs_sync --orders 5000 --concurrency 200
+#
+# Generates a SQLite file (bench.datagen), then serves it twice with uvicorn:
+# once on the sync routes (USE_ASYNC_DB=0, pysqlite on the threadpool) and
+# once on the async routes (USE_ASYNC_DB=1, aiosqlite), and drives both with
+# the same load.
+import argparse
+import asyncio
+
+from bench.datagen import create_database
+from bench.load import run_load
+from bench.server import serve, stop
+
+PATHS = ["/orders?limit=50", "/customers?limit=50", "/stats/summary", "/stats/revenue_7_days"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db", default="bench_async.db")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    create_database(args.db, args.customers, args.orders)
+
+    results = {}
+    for mode in ("sync", "async"):
+        proc = serve(args.db, args.port, mode == "async")
+        try:
+            results[mode] = [
+                asyncio.run(run_load(f"http://127.0.0.1:{args.port}", path, args.concurrency, args.requests))
+                for path in PATHS
+            ]
+        finally:
+            stop(proc)
+
+    print(f"{'path':28} {'mode':6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path_index, path in enumerate(PATHS):
+        for mode in ("sync", "async"):
+            r = results[mode][path_index]
+            print(f"{path:28} {mode:6} {r['rps']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/branches.py
+#
+#   cd wed_backend
+#   python -m bench.branches
+#
+# Checks branch scoping (branches.py) and shard routing (database.py) with
+# two SQLite files: the main database holding branch 1, and a shard that
+# branch 2 is routed to with BRANCH_SHARDS. Exits non-zero on a leak or a
+# wrong route.
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import httpx
+
+from bench.datagen import create_database
+from bench.server import serve, stop
+
+# every sync GET must answer for a branch that has no rows yet
+READ_PATHS = (
+    "/customers", "/customers/search?q=08", "/services", "/orders?limit=50", "/orders/pickup_queue",
+    "/payments?limit=50", "/order_items?limit=50", "/stats/summary", "/summary/dashboard",
+    "/stats/orders_by_status", "/stats/revenue_7_days", "/stats/turnaround", "/stats/revenue_daily",
+    "/export/orders",
+)
+
+def count(path: str, sql: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="bench_main.db")
+    parser.add_argument("--port", type=int, default=8769)
+    args = parser.parse_args()
+
+    create_database(args.db, 200, 1000)
+    root, ext = os.path.splitext(args.db)
+    shard = f"{root}-shard{ext}"
+    for path in (shard, f"{shard}-wal", f"{shard}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{args.db}", BRANCH_SHARDS=f"2=sqlite:///{shard}")
+    # the deploy steps: migrate every database, then register the branch
+    subprocess.run([sys.executable, "migrations.py", "upgrade"], env=env, check=True)
+    subprocess.run([sys.executable, "branches.py", "add", "2", "Shard"], env=env, check=True)
+
+    proc = serve(args.db, args.port, extra_env={"BRANCH_SHARDS": env["BRANCH_SHARDS"]})
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {name}")
+
+    b1, b2 = {"X-Branch-Id": "1"}, {"X-Branch-Id": "2"}
+    now = datetime.now()
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}") as client:
+            check("both branches listed", [b["branch_id"] for b in client.get("/branches").json()] == [1, 2])
+            check("unknown branch is a 404", client.get("/orders", headers={"X-Branch-Id": "9"}).status_code == 404)
+            for path in READ_PATHS:
+                check(f"GET {path} on the shard", client.get(path, headers=b2).status_code < 400)
+            check("shard starts empty", client.get("/orders", headers=b2).json() == [])
+
+            service = client.post("/services", headers=b2, json={"service_name": "Wash", "base_price": 40, "unit": "kg"}).json()
+            customer = client.post("/customers", headers=b2, json={"full_name": "Shard Check", "phone": "0811111111"}).json()
+            created = client.post("/orders/full", headers=b2, json={
+                "customer_id": customer["customer_id"], "status_id": 1,
+                "dropoff_datetime": now.isoformat(), "pickup_due_datetime": (now - timedelta(hours=1)).isoformat(),
+                "items": [{"service_id": service["service_id"], "qty": 2, "unit_price": 40}],
+                "payments": [{"pay_datetime": now.isoformat(), "method": "cash", "amount": 80}],
+            })
+            check("nested order on the shard", created.status_code == 200)
+            order_id = created.json()["order_id"]
+            check("order written to the shard", count(shard, "SELECT COUNT(*) FROM orders WHERE branch_id = 2") == 1)
+            check("nothing of branch 2 in main", count(args.db, "SELECT COUNT(*) FROM orders WHERE branch_id = 2") == 0)
+            check("branch 2 sees its order", [o["order_id"] for o in client.get("/orders", headers=b2).json()] == [order_id])
+            check("branch 2 revenue from the shard", client.get("/stats/summary", headers=b2).json()["total_revenue"] == 80)
+            check("branch 2 pickup queue", client.get("/orders/pickup_queue", headers=b2).json()["counts"]["overdue"] == 1)
+            check("branch 1 still on main", client.get("/stats/summary", headers=b1).json()["total_orders"] == 1000)
+            # ids are per database: the shard's customer 1 is not main's
+            check("branch 1 cannot find the branch 2 customer",
+                  client.get("/customers/search?q=shard check", headers=b1).json() == [])
+            check("branch 2 finds it", [c["customer_id"] for c in client.get(
+                "/customers/search?q=shard check", headers=b2).json()] == [customer["customer_id"]])
+            export = client.get("/export/orders?format=ndjson&branch_id=2").text.strip().splitlines()
+            check("export of branch 2", len(export) == 1)
+    finally:
+        stop(proc)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# bench/customer_search.py
+#
+#   cd wed_backend
+#   python -m bench.customer_search --customers 500000
+#
+# Generates N customers (Thai and Latin names, bench.datagen) into a SQLite file and times the
+# old LIKE '%q%' scan against the trigram / phone-prefix search.
+import argparse
+import time
+
+from bench.datagen import create_database
+
+def sample_queries(db, count: int = 8):
+    import models
+
+    rows = db.query(models.Customer.full_name, models.Customer.phone).limit(count).all()
+    queries = []
+    for i, (name, phone) in enumerate(rows):
+        # alternate: a last name, a first name, a phone prefix
+        queries.append([name.split()[-1], name.split()[0], phone[:6]][i % 3])
+    return queries
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=500_000)
+    parser.add_argument("--db", default="bench_search.db")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    create_database(args.db, args.customers, orders=0)
+    import database, models, search
+
+    print(f"loaded {args.customers} customers in {time.perf_counter() - started:.1f}s")
+
+    db = database.SessionLocal()
+
+    # the previous crud.search_customers, unbounded
+    def like_scan(q):
+        return db.query(models.Customer).filter(
+            (models.Customer.full_name.like(f"%{q}%")) |
+            (models.Customer.phone.like(f"%{q}%"))
+        ).all()
+
+    print(f"{'query':16} {'LIKE ms':>10} {'search ms':>10}")
+    for q in sample_queries(db):
+        like_ms = timed(lambda: like_scan(q))
+        search_ms = timed(lambda: search.search_customers(db, q, 20))
+        print(f"{q:16} {like_ms:>10.2f} {search_ms:>10.2f}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
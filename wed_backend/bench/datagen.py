@@ -0,0 +1,185 @@
+# bench/datagen.py
+#
+#   cd wed_backend
+#   python -m bench.datagen --db bench.db --customers 10000 --orders 50000 --months 12
+#   python -m bench.datagen --url mysql+pymysql://root:@localhost:3306/wed_bench
+#
+# Synthetic, reproducible shop data: customers with Thai and Latin names,
+# orders spread over the last N months with 1-5 items and 0-2 payments each.
+# Older orders are mostly picked up, recent ones spread across the active
+# statuses, like a real counter. Rows go in with multi-row INSERTs, and the
+# derived tables (search keys, daily_revenue) are filled the same way the
+# API would fill them.
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+STATUSES = ["pending", "washing", "drying", "ironing", "ready", "picked_up"]
+SERVICES = [
+    ("Wash & Fold", Decimal("40.00"), "kg"),
+    ("Wash & Iron", Decimal("60.00"), "kg"),
+    ("Dry Clean", Decimal("120.00"), "piece"),
+    ("Ironing only", Decimal("15.00"), "piece"),
+    ("Bedding / Blanket", Decimal("150.00"), "piece"),
+    ("Shoes", Decimal("200.00"), "pair"),
+]
+METHODS = ["cash", "qr", "transfer", "card"]
+METHOD_WEIGHTS = [40, 40, 15, 5]
+
+THAI_SYLLABLES = ["สม", "ชาย", "หญิง", "วิ", "ชัย", "มา", "ลี", "ประ", "เสริฐ", "สุ", "ดา", "อนันต์",
+                  "กาญ", "จนา", "ธน", "พล", "ปิ", "ยะ", "ใจ", "ดี", "รัก", "ศรี", "สุข", "บุญ", "ทอง", "คำ"]
+LATIN_SYLLABLES = ["jo", "hn", "ma", "ry", "an", "som", "chai", "li", "sa", "pe", "ter", "nok", "ploy",
+                   "tom", "ka", "te", "smi", "th", "bro", "wn", "wong", "tay", "lor", "boon", "lee"]
+
+def random_name(rng: random.Random, thai: bool) -> str:
+    syllables = THAI_SYLLABLES if thai else LATIN_SYLLABLES
+    first = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3)))
+    last = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+    return f"{first} {last}" if thai else f"{first.title()} {last.title()}"
+
+def random_phone(rng: random.Random) -> str:
+    return f"0{rng.choice('689')}{rng.randrange(10 ** 8):08d}"
+
+def pick_status(rng: random.Random, age_days: float) -> int:
+    # status_id 1..6; anything older than a week is almost surely collected
+    if age_days > 7:
+        return 6 if rng.random() < 0.97 else 5
+    if age_days > 3:
+        return rng.choices([4, 5, 6], [1, 3, 6])[0]
+    return rng.choices([1, 2, 3, 4, 5, 6], [4, 3, 2, 2, 2, 1])[0]
+
+
+def generate(engine, customers: int, orders: int, months: int = 12, seed: int = 42, batch: int = 2000) -> dict:
+    import models, rollups, search
+    from database import SessionLocal
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    span = timedelta(days=30 * months)
+    counts = {"customers": customers, "orders": orders, "order_items": 0, "payments": 0}
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Status.__table__), [
+            {"status_id": i, "status_name": name} for i, name in enumerate(STATUSES, 1)
+        ])
+        conn.execute(insert(models.Service.__table__), [
+            {"service_id": i, "service_name": name, "base_price": price, "unit": unit}
+            for i, (name, price, unit) in enumerate(SERVICES, 1)
+        ])
+
+        for start in range(0, customers, batch):
+            rows, grams = [], []
+            for customer_id in range(start + 1, min(start + batch, customers) + 1):
+                name = random_name(rng, thai=rng.random() < 0.6)
+                phone = random_phone(rng)
+                key = search.normalize_name(name)
+                rows.append({
+                    "customer_id": customer_id, "full_name": name, "phone": phone,
+                    "line_id": None, "address": None, "created_at": now - span,
+                    "phone_digits": phone, "name_key": key,
+                })
+                grams.extend(
+                    {"gram": g, "customer_id": customer_id, "branch_id": 1} for g in search.name_grams(key)
+                )
+            conn.execute(insert(models.Customer.__table__), rows)
+            conn.execute(insert(models.CustomerSearchGram.__table__), grams)
+
+        item_id = payment_id = 0
+        for start in range(0, orders, batch):
+            order_rows, item_rows, payment_rows = [], [], []
+            for order_id in range(start + 1, min(start + batch, orders) + 1):
+                # ids grow with time, like a real table
+                dropoff = now - span + span * (order_id / orders) - timedelta(minutes=rng.randrange(60))
+                age_days = (now - dropoff).total_seconds() / 86400
+                pickup_due = dropoff + timedelta(days=rng.choice([1, 2, 3]), hours=rng.randrange(8))
+                order_rows.append({
+                    "order_id": order_id,
+                    "customer_id": rng.randint(1, customers),
+                    "status_id": pick_status(rng, age_days),
+                    "dropoff_datetime": dropoff,
+                    "pickup_due_datetime": pickup_due if rng.random() < 0.95 else None,
+                    "notes": None,
+                    "created_at": dropoff,
+                })
+
+                total = Decimal(0)
+                for _ in range(rng.randint(1, 5)):
+                    service_id = rng.randint(1, len(SERVICES))
+                    qty = Decimal(rng.randint(1, 8))
+                    unit_price = SERVICES[service_id - 1][1]
+                    item_id += 1
+                    total += qty * unit_price
+                    item_rows.append({
+                        "item_id": item_id, "order_id": order_id, "service_id": service_id,
+                        "item_desc": SERVICES[service_id - 1][0], "qty": qty, "unit_price": unit_price,
+                    })
+
+                # most orders pay in full at dropoff or pickup; some pay in two parts, a few owe
+                parts = rng.choices([0, 1, 2], [5, 80, 15])[0]
+                for part in range(parts):
+                    payment_id += 1
+                    payment_rows.append({
+                        "payment_id": payment_id, "order_id": order_id,
+                        "pay_datetime": dropoff + timedelta(hours=rng.randrange(72) * part),
+                        "method": rng.choices(METHODS, METHOD_WEIGHTS)[0],
+                        "amount": (total / parts).quantize(Decimal("0.01")),
+                        "remark": None,
+                    })
+                order_rows[-1]["total_amount"] = total
+                order_rows[-1]["paid_amount"] = (total / parts).quantize(Decimal("0.01")) * parts if parts else Decimal(0)
+
+            conn.execute(insert(models.Order.__table__), order_rows)
+            conn.execute(insert(models.OrderItem.__table__), item_rows)
+            if payment_rows:
+                conn.execute(insert(models.Payment.__table__), payment_rows)
+            counts["order_items"] += len(item_rows)
+            counts["payments"] += len(payment_rows)
+
+    db = SessionLocal()
+    try:
+        rollups.rebuild_daily_revenue(db)
+    finally:
+        db.close()
+    return counts
+
+
+def populate(url: str, customers: int, orders: int, months: int = 12, seed: int = 42) -> dict:
+    # Migrate and fill the (empty) database at `url`. DATABASE_URL must be set
+    # before the app modules are imported, so this is the entry point scripts
+    # should use.
+    os.environ["DATABASE_URL"] = url
+    import database, migrations
+
+    migrations.upgrade(database.engine)
+    counts = generate(database.engine, customers, orders, months, seed)
+    # closing the last connection checkpoints the SQLite WAL into the file
+    database.engine.dispose()
+    return counts
+
+def create_database(db_path: str, customers: int, orders: int, months: int = 12, seed: int = 42) -> dict:
+    # Fresh SQLite file at `db_path`.
+    for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    return populate(f"sqlite:///{db_path}", customers, orders, months, seed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="fill this (empty) database instead of a new SQLite file")
+    args = parser.parse_args()
+    if args.url:
+        print(populate(args.url, args.customers, args.orders, args.months, args.seed))
+    else:
+        print(create_database(args.db, args.customers, args.orders, args.months, args.seed))
+
+if __name__ == "__main__":
+    main()
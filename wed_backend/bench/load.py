@@ -0,0 +1,63 @@
+# bench/load.py
+import asyncio
+import itertools
+import time
+from typing import Callable, List, Tuple, Union
+
+import httpx
+
+# ---------- Load driver ----------
+# `concurrency` clients share one keep-alive pool and pull from a common
+# request budget, so the result is closed-loop throughput plus the latency
+# distribution each client saw. `request` is either a GET path or a callable
+# taking the request number and returning (method, path, json_body), which
+# is how write scenarios vary their payloads.
+
+Request = Union[str, Callable[[int], Tuple[str, str, object]]]
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_load(base_url: str, request: Request, concurrency: int = 200, requests: int = 2000, name: str = None) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+    numbers = itertools.count()
+    if isinstance(request, str):
+        name = name or request
+        request = (lambda get_path: lambda _: ("GET", get_path, None))(request)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                method, path, body = request(next(numbers))
+                start = time.perf_counter()
+                try:
+                    res = await client.request(method, path, json=body)
+                    if res.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
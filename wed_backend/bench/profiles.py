@@ -0,0 +1,90 @@
+# bench/profiles.py
+#
+#   cd wed_backend
+#   python -m bench.profiles --orders 20000 --concurrency 50
+#   python -m bench.profiles --mysql-url mysql+pymysql://root:@localhost:3306/wed_bench
+#
+# Serves the same generated dataset under each storage profile (database.py)
+# and drives the read and write scenarios of bench.run against it:
+#
+#   sqlite-wal      DB_PROFILE=sqlite, WAL + synchronous=NORMAL + writer queue
+#   sqlite-default  SQLite's own settings (SQLITE_WAL=0), the old behaviour
+#   mysql           DB_PROFILE=mysql, only with --mysql-url; the database must
+#                   exist and be empty, it is filled with bench.datagen
+#
+# Every profile gets its own copy of the data, since the write scenarios
+# change it.
+import argparse
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+
+from bench.datagen import create_database
+from bench.load import run_load
+from bench.run import open_orders, scenarios
+from bench.server import serve, stop
+
+SCENARIOS = ("GET /orders", "GET /summary/dashboard", "POST /orders/full", "POST /payments", "PUT /orders/{id}/status")
+
+def copy_database(src: str, dst: str):
+    # backup API rather than a file copy: consistent even with a -wal file
+    # around, and no stale -wal / -shm from a previous run next to the copy
+    for path in (dst, f"{dst}-wal", f"{dst}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    source, target = sqlite3.connect(src), sqlite3.connect(dst)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--db", default="bench_profiles.db")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--mysql-url", help="empty MySQL database to include the mysql profile")
+    args = parser.parse_args()
+
+    counts = create_database(args.db, args.customers, args.orders)
+    profiles = {}
+    root, ext = os.path.splitext(args.db)
+    for name, wal in (("sqlite-wal", "1"), ("sqlite-default", "0")):
+        path = f"{root}-{name}{ext}"
+        copy_database(args.db, path)
+        profiles[name] = (path, {"DB_PROFILE": "sqlite", "SQLITE_WAL": wal})
+    if args.mysql_url:
+        subprocess.run(
+            [sys.executable, "-m", "bench.datagen", "--url", args.mysql_url,
+             "--customers", str(args.customers), "--orders", str(args.orders)],
+            check=True,
+        )
+        profiles["mysql"] = (args.db, {"DB_PROFILE": "mysql", "DATABASE_URL": args.mysql_url})
+
+    statuses = open_orders(args.db, counts)
+    results = {}
+    for profile, (path, env) in profiles.items():
+        # fresh scenario state per profile: each starts from the same data
+        wanted = [s for s in scenarios(counts, statuses) if s[0] in SCENARIOS]
+        proc = serve(path, args.port, extra_env=env)
+        try:
+            results[profile] = [
+                asyncio.run(run_load(f"http://127.0.0.1:{args.port}", request, args.concurrency, args.requests, name))
+                for name, request in wanted
+            ]
+        finally:
+            stop(proc)
+
+    print(f"{'scenario':26} {'profile':15} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for i, (name, _) in enumerate(wanted):
+        for profile, rows in results.items():
+            r = rows[i]
+            print(f"{name:26} {profile:15} {r['rps']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/replicas.py
+#
+#   cd wed_backend
+#   python -m bench.replicas
+#
+# Checks read/write routing (database.py) with two SQLite files standing in
+# for a primary and a replica. The "replica" is a copy taken before any write
+# and never catches up, which is replication lag at its worst: a read that
+# reaches it cannot see the new row. Exits non-zero on a wrong route.
+import argparse
+import os
+import sys
+import time
+
+import httpx
+
+from bench.datagen import create_database
+from bench.profiles import copy_database
+from bench.server import serve, stop
+
+PIN_SECONDS = 1.0
+
+# every sync GET must work on a read-only session
+READ_PATHS = (
+    "/customers", "/customers/search?q=08", "/services", "/statuses", "/orders?limit=50",
+    "/orders/1", "/orders/1/history", "/orders/pickup_queue", "/orders/1/items",
+    "/orders/1/payments", "/payments?limit=50", "/order_items?limit=50", "/stats/summary",
+    "/summary/dashboard", "/stats/orders_by_status", "/stats/revenue_7_days",
+    "/stats/turnaround", "/stats/revenue_daily", "/export/orders",
+)
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="bench_primary.db")
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    create_database(args.db, 200, 1000)
+    root, ext = os.path.splitext(args.db)
+    replica = f"{root}-replica{ext}"
+    copy_database(args.db, replica)
+
+    base = f"http://127.0.0.1:{args.port}"
+    proc = serve(args.db, args.port, extra_env={
+        "DB_REPLICA_URLS": f"sqlite:///{replica}",
+        "READ_YOUR_WRITES_SECONDS": str(PIN_SECONDS),
+    })
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {name}")
+
+    try:
+        with httpx.Client(base_url=base) as writer, httpx.Client(base_url=base) as other:
+            for path in READ_PATHS:
+                check(f"GET {path} on the replica", other.get(path).status_code < 400)
+
+            created = writer.post("/customers", json={"full_name": "Replica Check", "phone": "0800000000"})
+            customer_id = created.json()["customer_id"]
+            pin = created.headers.get("X-DB-Pin")
+            check("write answers with a pin", pin is not None)
+            path = f"/customers/{customer_id}"
+            check("other clients read the replica", other.get(path).status_code == 404)
+            check("writer reads its write (cookie)", writer.get(path).status_code == 200)
+            check("writer reads its write (header)", other.get(path, headers={"X-DB-Pin": pin}).status_code == 200)
+            time.sleep(PIN_SECONDS + 0.2)
+            check("pin runs out", writer.get(path).status_code == 404)
+            check("stale pin ignored", other.get(path, headers={"X-DB-Pin": pin}).status_code == 404)
+    finally:
+        stop(proc)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# bench/run.py
+#
+#   cd wed_backend
+#   python -m bench.run                                   # generate, run, print
+#   python -m bench.run --out bench/baseline.json         # record a baseline
+#   python -m bench.run --compare bench/baseline.json     # flag regressions
+#
+# End-to-end load test: generates a dataset with bench.datagen, serves the
+# real app with uvicorn and drives each scenario with concurrent clients,
+# reporting throughput and p50/p95/p99 per endpoint. Results are written as
+# JSON so a baseline can be committed and regressions show up in review.
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import sqlalchemy
+
+from bench.datagen import create_database, random_name, random_phone
+from bench.load import run_load
+from bench.server import serve, stop
+
+def recent_from(counts: dict) -> int:
+    # recent orders: the ones counter staff actually touch
+    return max(1, counts["orders"] - 500)
+
+def open_orders(db_path: str, counts: dict) -> dict:
+    # order_id -> status_id of the recent orders not yet picked up, so the
+    # status scenario only asks for moves the state machine allows
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute(
+            "SELECT order_id, status_id FROM orders WHERE order_id >= ? AND status_id != 6",
+            (recent_from(counts),),
+        ).fetchall())
+
+def scenarios(counts: dict, statuses: dict, seed: int = 7):
+    import workflow
+
+    rng = random.Random(seed)
+    customers, orders = counts["customers"], counts["orders"]
+    recent = recent_from(counts)
+    queries = [random_name(rng, thai=i % 2 == 0).split()[0][:4] for i in range(50)]
+    queries += [random_phone(rng)[:5] for _ in range(50)]
+    now = datetime.now().replace(microsecond=0)
+
+    def search(i):
+        return "GET", f"/customers/search?q={queries[i % len(queries)]}", None
+
+    def create_order(i):
+        return "POST", "/orders/full", {
+            "customer_id": rng.randint(1, customers),
+            "status_id": 1,
+            "dropoff_datetime": now.isoformat(),
+            "pickup_due_datetime": (now + timedelta(days=2)).isoformat(),
+            "items": [
+                {"service_id": rng.randint(1, 6), "qty": rng.randint(1, 5), "unit_price": 40}
+                for _ in range(rng.randint(1, 5))
+            ],
+            "payments": [{"pay_datetime": now.isoformat(), "method": "cash", "amount": 100}],
+        }
+
+    def create_payment(i):
+        return "POST", "/payments", {
+            "order_id": rng.randint(recent, orders),
+            "pay_datetime": now.isoformat(),
+            "method": rng.choice(["cash", "qr"]),
+            "amount": 50,
+        }
+
+    # round-robin over the open orders, one step forward each time; with
+    # hundreds of orders no two in-flight requests touch the same one
+    statuses = dict(statuses)
+    open_ids = sorted(statuses)
+
+    def update_status(i):
+        order_id = open_ids[i % len(open_ids)]
+        current = statuses[order_id]
+        target = min(workflow.TRANSITIONS[current] or {current})
+        statuses[order_id] = target
+        return "PUT", f"/orders/{order_id}/status", {"status_id": target, "expected_status_id": current}
+
+    return [
+        ("GET /orders", "/orders?limit=50"),
+        ("GET /orders?status_id", "/orders?status_id=1&limit=50"),
+        ("GET /orders/{id}", lambda i: ("GET", f"/orders/{rng.randint(recent, orders)}", None)),
+        ("GET /customers/search", search),
+        ("GET /summary/dashboard", "/summary/dashboard"),
+        ("GET /orders/pickup_queue", "/orders/pickup_queue"),
+        ("GET /stats/summary", "/stats/summary"),
+        ("GET /stats/orders_by_status", "/stats/orders_by_status"),
+        ("GET /stats/revenue_7_days", "/stats/revenue_7_days"),
+        ("POST /orders/full", create_order),
+        ("POST /payments", create_payment),
+        ("PUT /orders/{id}/status", update_status),
+    ]
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+    # A scenario regresses when p95 grows or throughput drops by more than
+    # `tolerance` (0.2 = 20%) against the baseline.
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = 0
+    print(f"\n{'scenario':30} {'p95 ms':>16} {'req/s':>16}")
+    for r in results["results"]:
+        old = previous.get(r["name"])
+        if not old:
+            continue
+        slower = old["p95_ms"] and r["p95_ms"] > old["p95_ms"] * (1 + tolerance)
+        fewer = r["rps"] < old["rps"] * (1 - tolerance)
+        flag = "  REGRESSION" if slower or fewer else ""
+        regressions += bool(flag)
+        print(f"{r['name']:30} {old['p95_ms']:>7}->{r['p95_ms']:<8} {old['rps']:>7}->{r['rps']:<8}{flag}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--async-db", action="store_true", help="serve with USE_ASYNC_DB=1")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    counts = create_database(args.db, args.customers, args.orders, args.months)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    proc = serve(args.db, args.port, use_async=args.async_db)
+    try:
+        rows = [
+            asyncio.run(run_load(base_url, request, args.concurrency, args.requests, name))
+            for name, request in scenarios(counts, open_orders(args.db, counts))
+        ]
+    finally:
+        stop(proc)
+
+    results = {
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "database": "sqlite",
+            "async_db": args.async_db,
+        },
+        "dataset": counts,
+        "load": {"concurrency": args.concurrency, "requests": args.requests},
+        "results": rows,
+    }
+
+    print(f"{'scenario':30} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for r in rows:
+        print(f"{r['name']:30} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
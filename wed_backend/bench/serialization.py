@@ -0,0 +1,43 @@
+# bench/serialization.py
+#
+#   cd wed_backend
+#   python -m bench.serialization --orders 20000 --limit 1000
+#
+# Times one /orders page built the old way (ORM objects validated through
+# schemas.Order) against the row-tuple path in projection.py, with the full
+# shape and with the columns the orders table actually renders.
+import argparse
+import time
+
+from bench.customer_search import timed
+from bench.datagen import create_database
+
+LIST_VIEW = "order_id,dropoff_datetime,pickup_due_datetime,customer.full_name,status.status_name"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--db", default="bench_serialization.db")
+    args = parser.parse_args()
+
+    create_database(args.db, customers=max(args.orders // 5, 1), orders=args.orders)
+    import crud, database, schemas
+    from cache import serialize
+    from projection import OrderProjection, dumps
+
+    db = database.SessionLocal()
+    cases = {
+        "orm + pydantic": lambda: serialize(crud.get_orders(db, limit=args.limit, load="list"), schemas.Order),
+        "rows, full shape": lambda: dumps(crud.get_order_rows(db, OrderProjection(None, None), limit=args.limit)),
+        "rows, list view": lambda: dumps(crud.get_order_rows(db, OrderProjection(LIST_VIEW, None), limit=args.limit)),
+    }
+    print(f"{'path':20} {'ms':>10} {'bytes':>10}")
+    for name, build in cases.items():
+        body = build()
+        ms = timed(lambda: (build(), db.expunge_all()))
+        print(f"{name:20} {ms:>10.2f} {len(body):>10}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
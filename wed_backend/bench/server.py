@@ -0,0 +1,40 @@
+# bench/server.py
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Runs the real app under uvicorn in a subprocess against a given database,
+# so benchmarks measure the full HTTP stack rather than in-process calls.
+
+def serve(db_path: str, port: int, use_async: bool = False, extra_env: dict = None) -> subprocess.Popen:
+    # extra_env may override the URLs (e.g. to serve a MySQL database)
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{db_path}",
+        USE_ASYNC_DB="1" if use_async else "0",
+    )
+    env.update(extra_env or {})
+    # keep-alive well past uvicorn's 5 s: under load a pooled connection can
+    # sit idle that long, and a request sent as uvicorn closes it fails with
+    # "Server disconnected", counted as an error that the app never saw
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", "75"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health")
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+def stop(proc: subprocess.Popen):
+    proc.terminate()
+    proc.wait()
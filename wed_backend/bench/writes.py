@@ -0,0 +1,70 @@
+# bench/writes.py
+#
+#   cd wed_backend
+#   python -m bench.writes --writes 2000
+#   python -m bench.writes --url mysql+pymysql://root:@localhost:3306/wed_bench
+#
+# Cost of the single-row inserts behind POST /order_items and POST /payments:
+# the crud functions as they are now (values known client-side, nothing read
+# back) against the same call followed by the refresh they used to do.
+# Reports statements and milliseconds per write; against a networked MySQL
+# every saved statement is a saved round trip.
+import argparse
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from bench.datagen import create_database, populate
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="bench_writes.db")
+    parser.add_argument("--url", help="use this (empty) database instead of a new SQLite file")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=1000)
+    args = parser.parse_args()
+
+    customers = max(args.orders // 5, 1)
+    if args.url:
+        populate(args.url, customers, args.orders)
+    else:
+        create_database(args.db, customers, args.orders)
+    import crud, database, schemas
+
+    statements = [0]
+    event.listen(database.engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    rng = random.Random(3)
+    def item():
+        return schemas.OrderItemCreate(
+            order_id=rng.randint(1, args.orders), service_id=rng.randint(1, 6),
+            qty=rng.randint(1, 5), unit_price=rng.choice([35, 40, 52.5]),
+        )
+    def payment():
+        return schemas.PaymentCreate(
+            order_id=rng.randint(1, args.orders), pay_datetime=datetime.now(),
+            method=rng.choice(["cash", "qr"]), amount=rng.choice([50, 80, 120]),
+        )
+
+    cases = {
+        "POST /order_items": lambda db: crud.create_order_item(db, item()),
+        "POST /order_items + refresh": lambda db: db.refresh(crud.create_order_item(db, item())),
+        "POST /payments": lambda db: crud.create_payment(db, payment()),
+        "POST /payments + refresh": lambda db: db.refresh(crud.create_payment(db, payment())),
+    }
+    print(f"{'write':30} {'stmts/write':>12} {'ms/write':>10}")
+    for name, write in cases.items():
+        statements[0] = 0
+        start = time.perf_counter()
+        for _ in range(args.writes):
+            # a session per write, as per request in the app
+            db = database.SessionLocal()
+            write(db)
+            db.close()
+        ms = (time.perf_counter() - start) * 1000 / args.writes
+        print(f"{name:30} {statements[0] / args.writes:>12.1f} {ms:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# branches.py
+#
+#   python branches.py add 2 "Siam Square"    register a branch (in its shard too)
+#   python branches.py list
+#
+# ---------- Branch scoping ----------
+# A request works on one branch: X-Branch-Id header (or ?branch_id= where
+# headers cannot be set, e.g. EventSource and download links), defaulting to
+# DEFAULT_BRANCH_ID. main.get_db tags the session with it
+# (session.info["branch_id"]) and from then on:
+#
+#   - every ORM statement the session runs (SELECT, UPDATE, DELETE, lazy
+#     and eager loads) only matches rows of models.BranchOwned models with
+#     that branch_id, added as loader criteria so crud, stats and rollups
+#     need no filters of their own;
+#   - objects added to the session get the branch_id before they are flushed.
+#
+# Core statements on bare Tables (archive.py, the daily_revenue upsert,
+# multi-row inserts) are not covered: they call scope() / current()
+# themselves. Sessions without a branch (maintenance scripts) see every
+# branch and write to DEFAULT_BRANCH_ID.
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+import database, models
+
+BRANCH_HEADER = "X-Branch-Id"
+DEFAULT_BRANCH_ID = int(os.getenv("DEFAULT_BRANCH_ID", "1"))
+KNOWN_BRANCH_TTL = 60.0
+
+class NotInBranch(LookupError):
+    # a referenced row does not exist in the request's branch
+    def __init__(self, kind: str, row_id: int, branch_id: int):
+        super().__init__(f"{kind} {row_id} not found in branch {branch_id}")
+        self.kind = kind
+        self.row_id = row_id
+        self.branch_id = branch_id
+
+def scope(db) -> Optional[int]:
+    # the session's branch, or None for an all-branch (maintenance) session
+    return db.info.get("branch_id")
+
+def current(db) -> int:
+    # branch for new rows
+    branch_id = scope(db)
+    return DEFAULT_BRANCH_ID if branch_id is None else branch_id
+
+def criteria(branch_id: int):
+    return with_loader_criteria(
+        models.BranchOwned, lambda cls: cls.branch_id == branch_id, include_aliases=True
+    )
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_statement(state):
+    branch_id = state.session.info.get("branch_id")
+    if branch_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(criteria(branch_id))
+
+@event.listens_for(Session, "before_flush")
+def _stamp_new_rows(session, flush_context, instances):
+    branch_id = session.info.get("branch_id")
+    if branch_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, models.BranchOwned) and obj.branch_id is None:
+            obj.branch_id = branch_id
+
+
+# ---------- Requests ----------
+
+def get_branch(request: Request) -> int:
+    # FastAPI dependency; also leaves the id on request.state for the ETag
+    value = request.headers.get(BRANCH_HEADER) or request.query_params.get("branch_id")
+    if value is None:
+        branch_id = DEFAULT_BRANCH_ID
+    else:
+        try:
+            branch_id = int(value)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid branch id {value!r}")
+    request.state.branch_id = branch_id
+    return branch_id
+
+# Branch ids seen in each database, so validating one costs a query per
+# TTL per process rather than per request. Misses are not cached: a branch
+# added with `python branches.py add` is usable right away.
+_known = {}
+_known_lock = threading.Lock()
+
+def check_known(db: Session, branch_id: int):
+    key = (id(db.get_bind()), branch_id)
+    with _known_lock:
+        if _known.get(key, 0) > time.monotonic():
+            return
+    found = db.execute(
+        select(models.Branch.branch_id).where(models.Branch.branch_id == branch_id)
+    ).scalar()
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown branch {branch_id}")
+    with _known_lock:
+        _known[key] = time.monotonic() + KNOWN_BRANCH_TTL
+
+
+# ---------- Registry ----------
+# The main database lists every branch (GET /branches). A branch routed to
+# a shard (database.BRANCH_SHARDS) is registered there as well, since its
+# rows reference it; the shard also gets the statuses, which every branch
+# shares, and the branch's table_versions counters.
+
+def add_branch(branch_id: int, name: str):
+    targets = [database.engine]
+    home = database.engine_for(branch_id)
+    if home is not database.engine:
+        targets.append(home)
+    for engine in targets:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                select(models.Branch.branch_id).where(models.Branch.branch_id == branch_id)
+            ).scalar()
+            if exists is None:
+                conn.execute(models.Branch.__table__.insert().values(
+                    branch_id=branch_id, branch_name=name, created_at=datetime.now()
+                ))
+    with home.begin() as conn:
+        if home is not database.engine:
+            statuses = models.Status.__table__
+            with database.engine.connect() as main:
+                rows = main.execute(select(statuses)).mappings().all()
+            have = set(conn.execute(select(statuses.c.status_id)).scalars())
+            missing = [dict(row) for row in rows if row["status_id"] not in have]
+            if missing:
+                conn.execute(statuses.insert(), missing)
+        table = models.TableVersion.__table__
+        existing = set(conn.execute(
+            select(table.c.table_name).where(table.c.branch_id == branch_id)
+        ).scalars())
+        missing = [t for t in models.VERSIONED_TABLES if t not in existing]
+        if missing:
+            conn.execute(table.insert(), [
+                {"branch_id": branch_id, "table_name": t, "version": 0} for t in missing
+            ])
+
+def list_branches(db: Session):
+    return db.execute(select(models.Branch).order_by(models.Branch.branch_id)).scalars().all()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "add" and len(sys.argv) == 4:
+        add_branch(int(sys.argv[2]), sys.argv[3])
+        print(f"branch {sys.argv[2]} added")
+    elif command == "list":
+        db = SessionLocal()
+        try:
+            for branch in list_branches(db):
+                print(f"{branch.branch_id:>4}  {branch.branch_name}")
+        finally:
+            db.close()
+    else:
+        sys.exit('usage: python branches.py add <branch_id> "<name>" | list')
@@ -0,0 +1,92 @@
+# cache.py
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+# ---------- Reference-data cache ----------
+# statuses and services almost never change but are fetched on every form
+# and dashboard load. Entries hold the response body already serialized to
+# JSON, so a hit skips the query, the ORM and Pydantic entirely. Entries
+# expire after `ttl` seconds (which bounds staleness across workers) and are
+# dropped explicitly by the crud write functions in this process. Callers that
+# know the table versions (versions.py) pass them in, so a change made through
+# another worker also invalidates the entry here.
+
+class ReferenceCache:
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[float, Optional[str], bytes]] = {}
+        self._lock = threading.Lock()
+        # one lock per key, held while that key loads
+        self._loading: Dict[str, threading.Lock] = {}
+        # bumped by invalidate(): a load that started before it is not stored
+        self._generation = 0
+
+    def _lookup(self, key: str, version: Optional[str]) -> Optional[bytes]:
+        # caller holds self._lock
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic() and entry[1] == version:
+            self.hits += 1
+            return entry[2]
+        return None
+
+    def get_or_load(self, key: str, loader: Callable[[], bytes], version: Optional[str] = None) -> bytes:
+        with self._lock:
+            body = self._lookup(key, version)
+            if body is not None:
+                return body
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        # The load runs outside the global lock, so it holds up neither hits
+        # nor other keys; a burst of misses on one key waits for the first
+        # load and takes its result, so it still costs one query.
+        with key_lock:
+            with self._lock:
+                body = self._lookup(key, version)
+                if body is not None:
+                    return body
+                self.misses += 1
+                generation = self._generation
+            body = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, version, body)
+            return body
+
+    def invalidate(self, key: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": sorted(self._entries),
+                "ttl": self.ttl,
+            }
+
+
+reference_cache = ReferenceCache()
+
+def from_orm(schema, row):
+    # Pydantic 2 only honours `from_attributes` when asked per call; 1.x
+    # reads `orm_mode` from the schema's Config.
+    if hasattr(schema, "model_validate"):
+        return schema.model_validate(row, from_attributes=True)
+    return schema.from_orm(row)
+
+def serialize(rows, schema) -> bytes:
+    return json.dumps(
+        jsonable_encoder([from_orm(schema, row) for row in rows]),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
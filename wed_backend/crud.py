@@ -1,26 +1,89 @@
-from sqlalchemy.orm import Session
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
-import models, schemas
+import models, schemas, rollups, search, events, versions, workflow, archive, branches
+from cache import reference_cache
+from pagination import DEFAULT_PAGE_SIZE, keyset
+from projection import RELATIONS, OrderProjection, shape_orders
+
+# ---------- Loading strategies ----------
+# schemas.Order serializes customer, status, items and payments, so any
+# endpoint returning it must load them up front or pay one lazy SELECT per
+# relationship per row. Lists join the many-to-one sides and selectin the
+# collections, so they cost a fixed number of queries regardless of how many
+# orders they hold; a single order is small enough to fetch in one joined
+# query.
+
+ORDER_LOADERS = {
+    "none": (),
+    "list": (
+        joinedload(models.Order.customer),
+        joinedload(models.Order.status),
+        selectinload(models.Order.items),
+        selectinload(models.Order.payments),
+    ),
+    "detail": (
+        joinedload(models.Order.customer),
+        joinedload(models.Order.status),
+        joinedload(models.Order.items),
+        joinedload(models.Order.payments),
+    ),
+}
+
+def order_query(db: Session, load: str = "none"):
+    return db.query(models.Order).options(*ORDER_LOADERS[load])
+
+
+# ---------- Branch checks ----------
+# Reads are scoped to the session's branch (branches.py), but ids sent in a
+# write body could point into another branch; those are refused before
+# anything is written.
+
+def _require(db: Session, model, row_id: int, kind: str):
+    if db.get(model, row_id) is None:
+        raise branches.NotInBranch(kind, row_id, branches.current(db))
+
+def _require_services(db: Session, service_ids):
+    wanted = set(service_ids)
+    found = set(db.execute(
+        select(models.Service.service_id).where(models.Service.service_id.in_(wanted))
+    ).scalars())
+    for service_id in sorted(wanted - found):
+        raise branches.NotInBranch("Service", service_id, branches.current(db))
+
 
 # ---------- Customers ----------
 
-def get_customers(db: Session) -> List[models.Customer]:
-    return db.query(models.Customer).all()
+def filter_customers(query, filters: schemas.CustomerFilter):
+    if filters.q:
+        query = query.filter(models.Customer.customer_id.in_(search.matching_ids_query(filters.q)))
+    return query
+
+def get_customers(
+    db: Session,
+    filters: Optional[schemas.CustomerFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[models.Customer]:
+    query = db.query(models.Customer)
+    if filters:
+        query = filter_customers(query, filters)
+    return keyset(query, models.Customer.customer_id, cursor, limit).all()
 
 def get_customer(db: Session, customer_id: int) -> Optional[models.Customer]:
     return db.query(models.Customer).filter(models.Customer.customer_id == customer_id).first()
 
-def search_customers(db: Session, q: str) -> List[models.Customer]:
-    return db.query(models.Customer).filter(
-        (models.Customer.full_name.like(f"%{q}%")) |
-        (models.Customer.phone.like(f"%{q}%"))
-    ).all()
+def search_customers(db: Session, q: str, limit: int = 20) -> List[models.Customer]:
+    return search.search_customers(db, q, limit)
 
 def create_customer(db: Session, data: schemas.CustomerCreate) -> models.Customer:
     obj = models.Customer(**data.dict())
+    search.index_customer(db, obj)
     db.add(obj)
+    versions.bump(db, "customers")
     db.commit()
-    db.refresh(obj)
     return obj
 
 def update_customer(db: Session, customer_id: int, data: schemas.CustomerUpdate) -> Optional[models.Customer]:
@@ -29,8 +92,9 @@ def update_customer(db: Session, customer_id: int, data: schemas.CustomerUpdate)
         return None
     for field, value in data.dict(exclude_unset=True).items():
         setattr(obj, field, value)
+    search.index_customer(db, obj)
+    versions.bump(db, "customers")
     db.commit()
-    db.refresh(obj)
     return obj
 
 def delete_customer(db: Session, customer_id: int) -> bool:
@@ -38,6 +102,7 @@ def delete_customer(db: Session, customer_id: int) -> bool:
     if not obj:
         return False
     db.delete(obj)
+    versions.bump(db, "customers")
     db.commit()
     return True
 
@@ -50,8 +115,9 @@ def get_services(db: Session) -> List[models.Service]:
 def create_service(db: Session, data: schemas.ServiceCreate) -> models.Service:
     obj = models.Service(**data.dict())
     db.add(obj)
+    versions.bump(db, "services")
     db.commit()
-    db.refresh(obj)
+    reference_cache.invalidate(f"services:{branches.current(db)}")
     return obj
 
 
@@ -63,54 +129,257 @@ def get_statuses(db: Session) -> List[models.Status]:
 
 # ---------- Orders ----------
 
-def get_orders(db: Session) -> List[models.Order]:
-    return db.query(models.Order).all()
-
-def get_order(db: Session, order_id: int) -> Optional[models.Order]:
-    return db.query(models.Order).filter(models.Order.order_id == order_id).first()
-
-def get_orders_by_status_id(db: Session, status_id: int) -> List[models.Order]:
-    return db.query(models.Order).filter(models.Order.status_id == status_id).all()
+def filter_orders(query, filters: schemas.OrderFilter):
+    if filters.status_id is not None:
+        query = query.filter(models.Order.status_id == filters.status_id)
+    if filters.customer_id is not None:
+        query = query.filter(models.Order.customer_id == filters.customer_id)
+    if filters.dropoff_from is not None:
+        query = query.filter(models.Order.dropoff_datetime >= filters.dropoff_from)
+    if filters.dropoff_to is not None:
+        query = query.filter(models.Order.dropoff_datetime < filters.dropoff_to)
+    if filters.pickup_from is not None:
+        query = query.filter(models.Order.pickup_due_datetime >= filters.pickup_from)
+    if filters.pickup_to is not None:
+        query = query.filter(models.Order.pickup_due_datetime < filters.pickup_to)
+    if filters.unpaid is not None:
+        query = query.filter(rollups.unpaid_filter(filters.unpaid))
+    if filters.q:
+        query = query.filter(models.Order.customer_id.in_(search.matching_ids_query(filters.q)))
+    if filters.notes:
+        query = query.filter(models.Order.notes.contains(filters.notes, autoescape=True))
+    return query
+
+def get_orders(
+    db: Session,
+    filters: Optional[schemas.OrderFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    load: str = "list",
+) -> List[models.Order]:
+    query = order_query(db, load)
+    if filters:
+        query = filter_orders(query, filters)
+    return keyset(query, models.Order.order_id, cursor, limit).all()
+
+# Projected lists (see projection.py): plain row tuples instead of ORM
+# objects, one query for the orders plus their customer / status columns and
+# one per requested collection.
+def order_rows_select(projection: OrderProjection):
+    columns = [getattr(models.Order, name) for name in projection.columns]
+    for relation in projection.joined():
+        model = RELATIONS[relation][0]
+        columns += [
+            getattr(model, name).label(f"{relation}.{name}")
+            for name in projection.relations[relation]
+        ]
+    stmt = select(*columns)
+    if "customer" in projection.relations:
+        stmt = stmt.join(models.Customer, models.Customer.customer_id == models.Order.customer_id)
+    if "status" in projection.relations:
+        stmt = stmt.join(models.Status, models.Status.status_id == models.Order.status_id)
+    return stmt
+
+def order_rows_query(
+    projection: OrderProjection,
+    filters: Optional[schemas.OrderFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    stmt = order_rows_select(projection)
+    if filters:
+        stmt = filter_orders(stmt, filters)
+    return keyset(stmt, models.Order.order_id, cursor, limit)
+
+def order_children_query(projection: OrderProjection, relation: str, order_ids: List[int]):
+    # ordered by order first, so the (order_id, branch_id) index serves both
+    # the IN list and the ORDER BY; by the primary key alone, SQLite walks the
+    # branch's whole (branch_id, pk) index instead
+    model = RELATIONS[relation][0]
+    pk = model.__mapper__.primary_key[0]
+    return (
+        select(model.order_id, *[getattr(model, name) for name in projection.relations[relation]])
+        .where(model.order_id.in_(order_ids))
+        .order_by(model.order_id, pk)
+    )
+
+def get_order_rows(
+    db: Session,
+    projection: OrderProjection,
+    filters: Optional[schemas.OrderFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[dict]:
+    rows = db.execute(order_rows_query(projection, filters, cursor, limit)).all()
+    order_ids = [row.order_id for row in rows]
+    children = {
+        relation: db.execute(order_children_query(projection, relation, order_ids)).all() if order_ids else []
+        for relation in projection.collections()
+    }
+    return shape_orders(rows, projection, children)
+
+def get_order(db: Session, order_id: int, load: str = "none") -> Optional[models.Order]:
+    return order_query(db, load).filter(models.Order.order_id == order_id).first()
+
+def get_order_or_archived(db: Session, order_id: int):
+    # Hot order as usual; an archived one (read-only, as a plain dict) only
+    # costs extra queries when the id is not in the hot table.
+    return get_order(db, order_id, load="detail") or archive.archived_order(db, order_id)
+
+def get_orders_by_status_id(
+    db: Session,
+    status_id: int,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    load: str = "list",
+) -> List[models.Order]:
+    query = order_query(db, load).filter(models.Order.status_id == status_id)
+    return keyset(query, models.Order.order_id, cursor, limit).all()
+
+def _publish_order_created(order: models.Order, payments: List[dict] = ()):
+    events.publish(
+        "order_created",
+        branch_id=order.branch_id,
+        order_id=order.order_id,
+        customer_id=order.customer_id,
+        status_id=order.status_id,
+        pickup_due_datetime=order.pickup_due_datetime,
+    )
+    for payment in payments:
+        events.publish("payment_created", branch_id=order.branch_id, **payment)
 
 def create_order(db: Session, data: schemas.OrderCreate) -> models.Order:
+    # a new order starts where the state machine allows (pending);
+    # raises workflow.InvalidTransition
+    workflow.check_transition(None, data.status_id)
+    _require(db, models.Customer, data.customer_id, "Customer")
     obj = models.Order(**data.dict())
     db.add(obj)
+    db.flush()
+    workflow.record(db, obj.order_id, None, obj.status_id)
+    versions.bump(db, "orders")
     db.commit()
-    db.refresh(obj)
+    # a new order has no items or payments yet; saves two SELECTs when the
+    # response is serialized
+    set_committed_value(obj, "items", [])
+    set_committed_value(obj, "payments", [])
+    set_committed_value(obj, "balance", Decimal(0))
+    _publish_order_created(obj)
     return obj
 
+def create_order_full(db: Session, data: schemas.OrderCreateFull) -> models.Order:
+    # Order, items and payments in one transaction: one INSERT for the order
+    # (its id is needed for the children), then one multi-row INSERT each for
+    # items and payments. Nothing is committed unless all of it succeeds.
+    workflow.check_transition(None, data.status_id)
+    _require(db, models.Customer, data.customer_id, "Customer")
+    if data.items:
+        _require_services(db, [item.service_id for item in data.items])
+    obj = models.Order(**data.dict(exclude={"items", "payments"}))
+    obj.total_amount = sum((item_amount(i.qty, i.unit_price) for i in data.items), Decimal(0))
+    obj.paid_amount = sum((Decimal(str(p.amount)) for p in data.payments), Decimal(0))
+    db.add(obj)
+    db.flush()
+    workflow.record(db, obj.order_id, None, obj.status_id)
+
+    items = [dict(item.dict(), order_id=obj.order_id, branch_id=obj.branch_id) for item in data.items]
+    if items:
+        db.execute(insert(models.OrderItem), items)
+
+    payments = [dict(payment.dict(), order_id=obj.order_id, branch_id=obj.branch_id) for payment in data.payments]
+    if payments:
+        db.execute(insert(models.Payment), payments)
+        rollups.record_payments(db, payments)
+
+    versions.bump(db, "orders", "order_items", "payments")
+    db.commit()
+    set_committed_value(obj, "balance", obj.total_amount - obj.paid_amount)
+    order = get_order(db, obj.order_id, load="detail")
+    _publish_order_created(order, [
+        {"payment_id": p.payment_id, "order_id": p.order_id, "pay_datetime": p.pay_datetime,
+         "method": p.method, "amount": p.amount}
+        for p in order.payments
+    ])
+    return order
+
 def update_order(db: Session, order_id: int, data: schemas.OrderUpdate) -> Optional[models.Order]:
     obj = get_order(db, order_id)
     if not obj:
         return None
-    for field, value in data.dict(exclude_unset=True).items():
+    old_status_id = obj.status_id
+    changes = data.dict(exclude_unset=True)
+    # status goes through the state machine, based on the status just read
+    status_id = changes.pop("status_id", None)
+    if status_id is not None and status_id != old_status_id:
+        workflow.transition(db, order_id, status_id, expected_status_id=old_status_id)
+        # the UPDATE bypassed the ORM; keep the loaded object in step
+        set_committed_value(obj, "status_id", status_id)
+    balance = obj.balance
+    for field, value in changes.items():
         setattr(obj, field, value)
+    versions.bump(db, "orders")
     db.commit()
-    db.refresh(obj)
+    # the ORM expires generated columns after its UPDATE; none of the
+    # editable fields feed them
+    set_committed_value(obj, "balance", balance)
+    if obj.status_id != old_status_id:
+        events.publish("order_status", branch_id=obj.branch_id, order_id=order_id,
+                       from_status_id=old_status_id, status_id=obj.status_id)
     return obj
 
+def get_order_status_history(db: Session, order_id: int) -> List[dict]:
+    # hot and archived rows, so the history outlives archiving
+    stmt = archive.status_history_query(order_id, branches.scope(db))
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
 def delete_order(db: Session, order_id: int) -> bool:
     obj = get_order(db, order_id)
     if not obj:
         return False
+    # payments go with the order via cascade; take them out of the rollup too
+    for payment in obj.payments:
+        rollups.unrecord_payment(db, payment)
     db.delete(obj)
+    versions.bump(db, "orders", "order_items", "payments")
     db.commit()
     return True
 
 
 # ---------- Order Items ----------
 
-def get_order_items(db: Session) -> List[models.OrderItem]:
-    return db.query(models.OrderItem).all()
+def get_order_items(
+    db: Session,
+    filters: Optional[schemas.OrderItemFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[models.OrderItem]:
+    query = db.query(models.OrderItem)
+    if filters and filters.order_id is not None:
+        query = query.filter(models.OrderItem.order_id == filters.order_id)
+    if filters and filters.service_id is not None:
+        query = query.filter(models.OrderItem.service_id == filters.service_id)
+    return keyset(query, models.OrderItem.item_id, cursor, limit).all()
 
 def get_order_items_for_order(db: Session, order_id: int) -> List[models.OrderItem]:
     return db.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).all()
 
+def item_amount(qty, unit_price) -> Decimal:
+    # Same value the database stores in the generated order_items.amount
+    # (ROUND(qty * unit_price, 2), half up), so a new item can be returned
+    # without reading the row back.
+    return (Decimal(str(qty)) * Decimal(str(unit_price))).quantize(Decimal("0.01"), ROUND_HALF_UP)
+
 def create_order_item(db: Session, data: schemas.OrderItemCreate) -> models.OrderItem:
+    _require(db, models.Service, data.service_id, "Service")
     obj = models.OrderItem(**data.dict())
+    amount = item_amount(obj.qty, obj.unit_price)
+    # the totals UPDATE doubles as the check that the order is in the branch
+    if rollups.add_order_amounts(db, obj.order_id, total=amount) == 0 or not amount:
+        _require(db, models.Order, obj.order_id, "Order")
     db.add(obj)
+    versions.bump(db, "order_items", "orders")
     db.commit()
-    db.refresh(obj)
+    set_committed_value(obj, "amount", amount)
     return obj
 
 def delete_order_item(db: Session, item_id: int) -> bool:
@@ -118,40 +387,92 @@ def delete_order_item(db: Session, item_id: int) -> bool:
     if not obj:
         return False
     db.delete(obj)
+    rollups.add_order_amounts(db, obj.order_id, total=-Decimal(str(obj.amount or 0)))
+    versions.bump(db, "order_items", "orders")
     db.commit()
     return True
 
 
 # ---------- Payments ----------
 
-def get_payments(db: Session) -> List[models.Payment]:
-    return db.query(models.Payment).all()
+def get_payments(
+    db: Session,
+    filters: Optional[schemas.PaymentFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[models.Payment]:
+    query = db.query(models.Payment)
+    if filters and filters.order_id is not None:
+        query = query.filter(models.Payment.order_id == filters.order_id)
+    if filters and filters.method:
+        query = query.filter(models.Payment.method == filters.method)
+    if filters and filters.pay_from is not None:
+        query = query.filter(models.Payment.pay_datetime >= filters.pay_from)
+    if filters and filters.pay_to is not None:
+        query = query.filter(models.Payment.pay_datetime < filters.pay_to)
+    return keyset(query, models.Payment.payment_id, cursor, limit).all()
 
 def get_payments_for_order(db: Session, order_id: int) -> List[models.Payment]:
     return db.query(models.Payment).filter(models.Payment.order_id == order_id).all()
 
 def create_payment(db: Session, data: schemas.PaymentCreate) -> models.Payment:
-    obj = models.Payment(**data.dict())
+    obj = models.Payment(**data.dict(), branch_id=branches.current(db))
+    paid = Decimal(str(obj.amount))
+    if rollups.add_order_amounts(db, obj.order_id, paid=paid) == 0 or not paid:
+        _require(db, models.Order, obj.order_id, "Order")
     db.add(obj)
+    rollups.record_payment(db, obj)
+    versions.bump(db, "payments", "orders")
     db.commit()
-    db.refresh(obj)
+    events.publish(
+        "payment_created",
+        branch_id=obj.branch_id,
+        payment_id=obj.payment_id,
+        order_id=obj.order_id,
+        pay_datetime=obj.pay_datetime,
+        method=obj.method,
+        amount=obj.amount,
+    )
     return obj
 
 def delete_payment(db: Session, payment_id: int) -> bool:
     obj = db.query(models.Payment).filter(models.Payment.payment_id == payment_id).first()
     if not obj:
         return False
+    rollups.unrecord_payment(db, obj)
+    rollups.add_order_amounts(db, obj.order_id, paid=-Decimal(str(obj.amount)))
     db.delete(obj)
+    versions.bump(db, "payments", "orders")
     db.commit()
     return True
 
-def update_order_status(db: Session, order_id: int, status_id: int) -> bool:
-    order = get_order(db, order_id)
-    if not order:
+def update_order_status(
+    db: Session,
+    order_id: int,
+    status_id: int,
+    expected_status_id: Optional[int] = None,
+) -> bool:
+    # One conditional UPDATE plus the history row (workflow.transition);
+    # raises workflow.InvalidTransition / StatusConflict.
+    old_status_id = workflow.transition(db, order_id, status_id, expected_status_id)
+    if old_status_id is None:
         return False
-
-    order.status_id = status_id
+    versions.bump(db, "orders")
     db.commit()
-    db.refresh(order)
+    events.publish("order_status", branch_id=branches.current(db), order_id=order_id,
+                   from_status_id=old_status_id, status_id=status_id)
     return True
 
+def update_order_status_bulk(db: Session, order_ids: List[int], status_id: int) -> List[dict]:
+    # One transaction for the whole load (workflow.transition_many) and one
+    # "order_status_bulk" event listing the orders that moved.
+    results = workflow.transition_many(db, order_ids, status_id)
+    moved = [
+        {"order_id": r["order_id"], "from_status_id": r["from_status_id"]}
+        for r in results if r["result"] == workflow.MOVED
+    ]
+    if moved:
+        versions.bump(db, "orders")
+        db.commit()
+        events.publish("order_status_bulk", branch_id=branches.current(db), status_id=status_id, orders=moved)
+    return results
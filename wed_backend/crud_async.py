@@ -0,0 +1,87 @@
+# crud_async.py
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models, schemas, stats, rollups, versions
+from crud import filter_customers, order_rows_query, order_children_query
+from pagination import DEFAULT_PAGE_SIZE, keyset
+from projection import OrderProjection, shape_orders
+
+# Async counterparts of the hot read paths in crud / stats / rollups / versions. They
+# reuse the same filters and statements, only the execution differs.
+
+# ---------- Customers ----------
+
+async def get_customers(
+    db: AsyncSession,
+    filters: Optional[schemas.CustomerFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[models.Customer]:
+    stmt = select(models.Customer)
+    if filters:
+        stmt = filter_customers(stmt, filters)
+    stmt = keyset(stmt, models.Customer.customer_id, cursor, limit)
+    return (await db.execute(stmt)).scalars().all()
+
+
+# ---------- Orders ----------
+
+async def get_order_rows(
+    db: AsyncSession,
+    projection: OrderProjection,
+    filters: Optional[schemas.OrderFilter] = None,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> List[dict]:
+    rows = (await db.execute(order_rows_query(projection, filters, cursor, limit))).all()
+    order_ids = [row.order_id for row in rows]
+    children = {}
+    for relation in projection.collections():
+        children[relation] = (
+            (await db.execute(order_children_query(projection, relation, order_ids))).all()
+            if order_ids else []
+        )
+    return shape_orders(rows, projection, children)
+
+
+# ---------- Stats ----------
+
+async def status_counts(db: AsyncSession):
+    return (await db.execute(stats.status_counts_query())).all()
+
+async def summary(db: AsyncSession) -> dict:
+    counts = await status_counts(db)
+    revenue = (await db.execute(stats.revenue_totals_query())).one()
+    return stats.build_summary(counts, revenue)
+
+async def dashboard(db: AsyncSession, pending_limit: int = 20, pickup_limit: int = 50) -> dict:
+    today = date.today()
+    results = {}
+    for name, stmt in stats.dashboard_queries(pending_limit, pickup_limit, today).items():
+        results[name] = (await db.execute(stmt)).all()
+    return stats.build_dashboard(results, today)
+
+async def pickup_queue(db: AsyncSession, limit: int = 50) -> dict:
+    now = datetime.now()
+    results = {}
+    for name, stmt in stats.pickup_queue_queries(limit, now).items():
+        results[name] = (await db.execute(stmt)).all()
+    return stats.build_pickup_queue(results, now)
+
+async def revenue_series(db: AsyncSession, days: int = 7) -> List[dict]:
+    start, end = rollups.series_bounds(days)
+    rows = (await db.execute(rollups.revenue_series_query(start, end))).all()
+    return rollups.fill_revenue_series(rows, start, days)
+
+
+# ---------- Table versions ----------
+
+async def conditional(db: AsyncSession, request, *tables: str):
+    rows = (await db.execute(versions.versions_query(tables))).all()
+    etag = versions.make_etag(request, tables, rows)
+    versions.check_not_modified(request, etag)
+    return etag
@@ -1,23 +1,278 @@
 # database.py
-from sqlalchemy import create_engine
+import itertools
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DB_USER = "root"
-DB_PASS = ""          # empty password
-DB_HOST = "localhost"
-DB_NAME = "wed_project"
+from metrics import instrument_engine
+
+# ---------- Storage profiles ----------
+# DB_PROFILE picks how the engine is built:
+#
+#   mysql   (default) MySQL / MariaDB over pymysql with an explicitly sized
+#           pool. DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME, DB_POOL_SIZE,
+#           DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE.
+#   sqlite  one file (SQLITE_PATH), for a single shop on a small box: WAL so
+#           readers never wait for the writer, synchronous=NORMAL, mmap reads,
+#           and writes queued through one lock per process instead of
+#           failing with "database is locked". SQLITE_WAL=0 keeps SQLite's
+#           own defaults (rollback journal, synchronous=FULL), for comparison.
+#
+# DATABASE_URL overrides the URL; when DB_PROFILE is unset the profile
+# follows its scheme.
+
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASS = os.getenv("DB_PASS", "")          # empty password
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "3306"))
+DB_NAME = os.getenv("DB_NAME", "wed_project")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:3306/{DB_NAME}?charset=utf8mb4"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "laundry.db")
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_PROFILE = os.getenv("DB_PROFILE") or (
+    "sqlite" if DATABASE_URL and DATABASE_URL.startswith("sqlite") else "mysql"
 )
+if DATABASE_URL is None:
+    DATABASE_URL = (
+        f"sqlite:///{SQLITE_PATH}" if DB_PROFILE == "sqlite" else
+        f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+    )
+
+MYSQL_POOL = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # below MySQL's wait_timeout, so idle connections are replaced before
+    # the server drops them
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+SQLITE_BUSY_TIMEOUT = 5.0
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",          # durable at checkpoints; safe with WAL
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32000,             # 32 MB page cache per connection
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+SQLITE_DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL", "foreign_keys": "ON"}
+
+def _sqlite_pragmas(engine):
+    pragmas = SQLITE_PRAGMAS if SQLITE_WAL else SQLITE_DEFAULT_PRAGMAS
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# SQLite has a single writer per database. Rather than letting concurrent
+# sessions collide and retry on SQLITE_BUSY, a session takes the writer lock
+# before its first write (flush or DML statement) and holds it until its
+# transaction ends, so writers queue in arrival order and readers carry on.
+class WriterQueue:
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def acquire(self, session):
+        if session.info.get("sqlite_writer"):
+            return
+        if not self._lock.acquire(timeout=self.timeout):
+            raise TimeoutError("timed out waiting for the SQLite writer")
+        session.info["sqlite_writer"] = True
+
+    def release(self, session):
+        # may run on another threadpool thread than acquire(); Lock allows it
+        if session.info.pop("sqlite_writer", False):
+            self._lock.release()
 
+    def install(self, session_factory):
+        @event.listens_for(session_factory, "before_flush")
+        def _before_flush(session, flush_context, instances):
+            self.acquire(session)
+
+        @event.listens_for(session_factory, "do_orm_execute")
+        def _before_execute(state):
+            if state.is_insert or state.is_update or state.is_delete:
+                self.acquire(state.session)
+
+        @event.listens_for(session_factory, "after_transaction_end")
+        def _after_transaction(session, transaction):
+            if transaction.parent is None:
+                self.release(session)
+
+
+def _make_engine(url: str):
+    if DB_PROFILE == "sqlite":
+        new_engine = create_engine(
+            url,
+            # connections are shared across the threadpool FastAPI runs sync routes on
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+        )
+        _sqlite_pragmas(new_engine)
+    else:
+        new_engine = create_engine(url, **MYSQL_POOL)
+    instrument_engine(new_engine)
+    return new_engine
+
+engine = _make_engine(DATABASE_URL)
+
+# expire_on_commit=False: crud returns the objects it just wrote, and with
+# every column known client-side (ids from the INSERT, timestamps from
+# Python defaults, item amounts from crud.item_amount) reading them back
+# after the commit would only repeat what the session already has.
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine
 )
 
+writer_queue = None
+if DB_PROFILE == "sqlite" and SQLITE_WAL:
+    writer_queue = WriterQueue()
+    writer_queue.install(SessionLocal)
+
+# ---------- Read replicas ----------
+# DB_REPLICA_URLS (comma-separated, same profile as the primary) adds read
+# replicas. main.get_db gives GET / HEAD requests a read-only session on one
+# of them, round robin; everything else goes to the primary. A client that
+# wrote less than READ_YOUR_WRITES_SECONDS ago reads from the primary too,
+# so it never misses its own write through replication lag: the write's
+# response carries a pin (X-DB-Pin header and db_pin cookie) and reads that
+# send it back stay on the primary until it runs out. Without replicas the
+# read sessions use the primary, still read-only.
+#
+# Local stand-in: a copy of the SQLite file as the "replica", which simply
+# never catches up (see bench/replicas.py).
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PIN_HEADER = "X-DB-Pin"
+PIN_COOKIE = "db_pin"
+READ_METHODS = ("GET", "HEAD")
+
+replica_engines = [_make_engine(url) for url in REPLICA_URLS]
+_read_engines = itertools.cycle(replica_engines or [engine])
+
+class ReadOnlySessionError(RuntimeError):
+    pass
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+
+@event.listens_for(ReadSessionLocal, "before_flush")
+def _read_only_flush(session, flush_context, instances):
+    raise ReadOnlySessionError("write attempted in a read-only (replica) session")
+
+@event.listens_for(ReadSessionLocal, "do_orm_execute")
+def _read_only_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        raise ReadOnlySessionError("write attempted in a read-only (replica) session")
+
+def read_session():
+    return ReadSessionLocal(bind=next(_read_engines))
+
+def new_pin() -> str:
+    return f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}"
+
+def is_pinned(pin) -> bool:
+    try:
+        until = float(pin)
+    except (TypeError, ValueError):
+        return False
+    now = time.time()
+    # anything further out than one window was not issued by new_pin()
+    return now < until <= now + READ_YOUR_WRITES_SECONDS
+
+# ---------- Branch shards ----------
+# BRANCH_SHARDS moves branches into databases of their own, so a busy branch
+# does not slow the others down:
+#
+#   BRANCH_SHARDS="3=mysql+pymysql://root:@db-b:3306/wed_project,4=mysql+pymysql://root:@db-b:3306/wed_project"
+#
+# Branches not listed stay in the main database (DATABASE_URL plus its
+# replicas). A shard has the full schema (`python migrations.py upgrade`
+# migrates every shard too) and serves reads and writes of its branches;
+# ids are per database, so a branch's ids are only unique within it.
+
+BRANCH_SHARDS = {
+    int(branch): url.strip()
+    for branch, _, url in (
+        entry.partition("=") for entry in os.getenv("BRANCH_SHARDS", "").split(",") if entry.strip()
+    )
+}
+_shard_engines = {url: _make_engine(url) for url in set(BRANCH_SHARDS.values())}
+_shard_sessions = {}
+for _url, _shard_engine in _shard_engines.items():
+    _shard_sessions[_url] = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=_shard_engine
+    )
+    if writer_queue is not None:
+        # one writer lock per SQLite file
+        WriterQueue().install(_shard_sessions[_url])
+
+def engine_for(branch_id: int):
+    url = BRANCH_SHARDS.get(branch_id)
+    return engine if url is None else _shard_engines[url]
+
+def all_engines() -> list:
+    return [engine] + list(_shard_engines.values())
+
+def session_for(branch_id: int, read: bool = False):
+    # A session tagged with the branch (branches.py scopes it) in the
+    # branch's database: a replica for reads, unless the branch is sharded.
+    url = BRANCH_SHARDS.get(branch_id)
+    if url is not None:
+        session = ReadSessionLocal(bind=_shard_engines[url]) if read else _shard_sessions[url]()
+    else:
+        session = read_session() if read else SessionLocal()
+    session.info["branch_id"] = branch_id
+    return session
+
 Base = declarative_base()
+
+# ---------- Async (opt-in) ----------
+# USE_ASYNC_DB=1 serves the hot read endpoints from async routes on an async
+# engine (see async_api.py) instead of sync routes on Starlette's threadpool.
+# The driver (aiomysql / aiosqlite) is only imported when enabled. Async
+# routes only read, so the SQLite writer queue does not apply to them.
+
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "0") == "1"
+
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    f"sqlite+aiosqlite:///{SQLITE_PATH}" if DB_PROFILE == "sqlite" else
+    f"mysql+aiomysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4",
+)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if USE_ASYNC_DB and BRANCH_SHARDS:
+    # the async routes only know the main database
+    raise RuntimeError("USE_ASYNC_DB=1 cannot be combined with BRANCH_SHARDS")
+
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    if DB_PROFILE == "sqlite":
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args={"timeout": SQLITE_BUSY_TIMEOUT})
+        _sqlite_pragmas(async_engine.sync_engine)
+    else:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **MYSQL_POOL)
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
@@ -0,0 +1,104 @@
+# events.py
+import asyncio
+import itertools
+import json
+import threading
+from typing import Set
+
+from projection import json_default
+
+# ---------- Change feed ----------
+# crud publishes small delta events (status changes, new orders, new
+# payments) after each commit; every connected dashboard receives them over
+# Server-Sent Events (GET /events) and patches its state instead of
+# refetching. Subscribers only get their own branch's events (the
+# `branch_id` every event carries). Delivery is per process: with several
+# workers each one only sees its own writes, and a client that falls behind
+# gets a "resync" event telling it to refetch once.
+
+QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, branch_id: int):
+        self.loop = loop
+        self.branch_id = branch_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, message: str):
+        # runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(format_event(0, "resync", {}))
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, branch_id: int) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), branch_id)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event: str, data: dict):
+        # Safe to call from sync routes on the threadpool: delivery is handed
+        # to each subscriber's loop.
+        message = format_event(next(self._ids), event, data)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.branch_id == data.get("branch_id")]
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, message)
+            except RuntimeError:
+                # loop already closed; the stream's finally will unsubscribe
+                pass
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_event(event_id: int, event: str, data: dict) -> str:
+    payload = json.dumps(data, default=json_default, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+broadcaster = Broadcaster()
+
+def publish(event: str, **data):
+    broadcaster.publish(event, data)
+
+async def stream(request, branch_id: int):
+    sub = broadcaster.subscribe(branch_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # comment line keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            yield message
+            if sub.overflowed and sub.queue.empty():
+                sub.overflowed = False
+    finally:
+        broadcaster.unsubscribe(sub)
@@ -0,0 +1,133 @@
+# export.py
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import select
+
+import archive, models
+from database import session_for
+from projection import json_default
+
+# ---------- Streaming export ----------
+# Rows are read as plain tuples through a server-side cursor (`yield_per`)
+# and written out one batch at a time, so memory stays flat no matter how
+# many rows the export covers. Each export opens its own session because the
+# generator outlives the request's `get_db` dependency.
+
+BATCH_SIZE = 1000
+
+# Orders and payments cover archived rows too (archive.union_sides): an
+# export is a historical report. Those are plain tables, so the branch is
+# filtered here; the customer export is scoped by its session (branches.py).
+
+def orders_query(branch_id, date_from=None, date_to=None, status_id=None):
+    def build(tables):
+        order = tables["orders"]
+        stmt = (
+            select(
+                order.c.order_id,
+                order.c.customer_id,
+                models.Customer.full_name.label("customer_name"),
+                models.Customer.phone,
+                models.Status.status_name,
+                order.c.dropoff_datetime,
+                order.c.pickup_due_datetime,
+                order.c.notes,
+                order.c.created_at,
+            )
+            .join(models.Customer, models.Customer.customer_id == order.c.customer_id)
+            .join(models.Status, models.Status.status_id == order.c.status_id)
+            .where(order.c.branch_id == branch_id)
+        )
+        if date_from is not None:
+            stmt = stmt.where(order.c.dropoff_datetime >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(order.c.dropoff_datetime < date_to)
+        if status_id is not None:
+            stmt = stmt.where(order.c.status_id == status_id)
+        return stmt
+    return archive.ordered(archive.union_sides(build), "order_id")
+
+def payments_query(branch_id, date_from=None, date_to=None, status_id=None):
+    def build(tables):
+        payment = tables["payments"]
+        stmt = select(
+            payment.c.payment_id,
+            payment.c.order_id,
+            payment.c.pay_datetime,
+            payment.c.method,
+            payment.c.amount,
+            payment.c.remark,
+        ).where(payment.c.branch_id == branch_id)
+        if date_from is not None:
+            stmt = stmt.where(payment.c.pay_datetime >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(payment.c.pay_datetime < date_to)
+        if status_id is not None:
+            order = tables["orders"]
+            stmt = stmt.join(order, order.c.order_id == payment.c.order_id).where(order.c.status_id == status_id)
+        return stmt
+    return archive.ordered(archive.union_sides(build), "payment_id")
+
+def customers_query(branch_id, date_from=None, date_to=None, status_id=None):
+    stmt = select(
+        models.Customer.customer_id,
+        models.Customer.full_name,
+        models.Customer.phone,
+        models.Customer.line_id,
+        models.Customer.address,
+        models.Customer.created_at,
+    ).order_by(models.Customer.customer_id)
+    if date_from is not None:
+        stmt = stmt.where(models.Customer.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.Customer.created_at < date_to)
+    # customers have no status; status_id is ignored
+    return stmt
+
+EXPORTS = {
+    "orders": orders_query,
+    "payments": payments_query,
+    "customers": customers_query,
+}
+
+
+# ---------- Writers ----------
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+def stream_rows(stmt, fmt: str, branch_id: int, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    # exports are the heaviest reads there are: always a replica (or the
+    # branch's shard)
+    db = session_for(branch_id, read=True)
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # BOM so Excel opens Thai text as UTF-8
+            buffer.write("\ufeff")
+            writer.writerow(columns)
+            for rows in result.partitions():
+                writer.writerows([_csv_value(v) for v in row] for row in rows)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=json_default, ensure_ascii=False) + "\n"
+                    for row in rows
+                ).encode("utf-8")
+    finally:
+        db.close()
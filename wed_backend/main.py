@@ -1,15 +1,32 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-
-from database import SessionLocal, engine
-import models, schemas, crud
-
-# Create DB tables if not exist
-models.Base.metadata.create_all(bind=engine)
+from datetime import datetime
+import os
+import time
+from typing import List, Literal, Optional
+
+import database
+from database import SessionLocal, USE_ASYNC_DB
+import models, schemas, crud, stats, rollups, export, events, versions, workflow, branches
+from cache import reference_cache, serialize
+from pagination import Page, set_next_cursor
+from projection import OrderProjection, dumps
+import metrics
+
+# Schema is managed by migrations.py (`python migrations.py upgrade`), not at
+# import, so workers start without introspecting the database.
 
 app = FastAPI(title="Laundry Shop API")
+# times each endpoint and its response serialization (metrics.py)
+app.router.route_class = metrics.InstrumentedRoute
+
+# Opt-in async read path; registered first so it shadows the sync handlers
+# for the same paths below.
+if USE_ASYNC_DB:
+    import async_api
+    app.include_router(async_api.router)
 
 # ------------------- CORS -------------------
 app.add_middleware(
@@ -18,25 +35,119 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-DB-Query-Count", "X-DB-Time-Ms", database.PIN_HEADER],
 )
 
+# ------------------- METRICS ----------------
+# METRICS_QUERY_HEADER=1 also reports each request's SQL count / time in
+# response headers, for profiling from the browser or a load test.
+QUERY_HEADERS = os.getenv("METRICS_QUERY_HEADER", "0") == "1"
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats, token = metrics.start_request()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if QUERY_HEADERS:
+            response.headers["X-DB-Query-Count"] = str(stats.queries)
+            response.headers["X-DB-Time-Ms"] = f"{stats.sql_seconds * 1000:.2f}"
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.record_request(
+            request.method,
+            route.path if route else "<unmatched>",
+            status,
+            time.perf_counter() - start,
+            stats,
+        )
+        metrics.end_request(token)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ------------------- DB ---------------------
-def get_db():
-    db = SessionLocal()
+# A session scoped to the request's branch (branches.py), in that branch's
+# database. Reads go to a replica (database.py), writes and
+# recently-writing clients to the primary.
+def get_db(request: Request, branch_id: int = Depends(branches.get_branch)):
+    pin = request.headers.get(database.PIN_HEADER) or request.cookies.get(database.PIN_COOKIE)
+    read = request.method in database.READ_METHODS and not database.is_pinned(pin)
+    db = database.session_for(branch_id, read=read)
     try:
+        branches.check_known(db, branch_id)
         yield db
     finally:
         db.close()
 
+# get_db's branch check alone, for the streaming routes that open their own
+# sessions (export.py) or none (events.py)
+def known_branch(branch_id: int = Depends(branches.get_branch)) -> int:
+    db = database.session_for(branch_id, read=True)
+    try:
+        branches.check_known(db, branch_id)
+    finally:
+        db.close()
+    return branch_id
+
+@app.middleware("http")
+async def pin_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if database.replica_engines and request.method not in database.READ_METHODS and response.status_code < 400:
+        pin = database.new_pin()
+        response.headers[database.PIN_HEADER] = pin
+        response.set_cookie(
+            database.PIN_COOKIE, pin,
+            max_age=int(database.READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite="lax",
+        )
+    return response
+
 # ------------------- Health -----------------
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+# ------------------- BRANCHES ----------------
+# The directory of branches lives in the main database, whichever branch
+# the request is for. Branches are added with `python branches.py add`.
+@app.get("/branches", response_model=List[schemas.Branch])
+def list_branches():
+    db = SessionLocal()
+    try:
+        return branches.list_branches(db)
+    finally:
+        db.close()
+
+@app.exception_handler(branches.NotInBranch)
+def not_in_branch_handler(request: Request, exc: branches.NotInBranch):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
 # ------------------- CUSTOMERS ---------------
 @app.get("/customers", response_model=List[schemas.Customer])
-def list_customers(db: Session = Depends(get_db)):
-    return crud.get_customers(db)
+def list_customers(
+    request: Request,
+    response: Response,
+    filters: schemas.CustomerFilter = Depends(),
+    page: Page = Depends(),
+    db: Session = Depends(get_db),
+):
+    etag = versions.conditional(db, request, "customers")
+    response.headers.update(versions.etag_headers(etag))
+    rows = crud.get_customers(db, filters, page.cursor, page.limit)
+    return set_next_cursor(response, page, rows, "customer_id")
+
+# declared before /customers/{customer_id} so "search" is not taken as an id
+@app.get("/customers/search", response_model=List[schemas.Customer])
+def search_customers(
+    q: str = Query(..., min_length=1, description="search by name or phone"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    return crud.search_customers(db, q, limit)
 
 @app.get("/customers/{customer_id}", response_model=schemas.Customer)
 def get_customer(customer_id: int, db: Session = Depends(get_db)):
@@ -45,13 +156,6 @@ def get_customer(customer_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
-@app.get("/customers/search", response_model=List[schemas.Customer])
-def search_customers(
-    q: str = Query(..., description="search by name or phone"),
-    db: Session = Depends(get_db),
-):
-    return crud.search_customers(db, q)
-
 @app.post("/customers", response_model=schemas.Customer)
 def create_customer(payload: schemas.CustomerCreate, db: Session = Depends(get_db)):
     return crud.create_customer(db, payload)
@@ -76,8 +180,13 @@ def delete_customer(customer_id: int, db: Session = Depends(get_db)):
 
 # ------------------- SERVICES ----------------
 @app.get("/services", response_model=List[schemas.Service])
-def list_services(db: Session = Depends(get_db)):
-    return crud.get_services(db)
+def list_services(request: Request, db: Session = Depends(get_db)):
+    etag, version = versions.conditional_counters(db, request, "services")
+    body = reference_cache.get_or_load(
+        f"services:{branches.current(db)}", lambda: serialize(crud.get_services(db), schemas.Service),
+        version=version,
+    )
+    return Response(content=body, media_type="application/json", headers=versions.etag_headers(etag))
 
 @app.post("/services", response_model=schemas.Service)
 def create_service(payload: schemas.ServiceCreate, db: Session = Depends(get_db)):
@@ -85,29 +194,74 @@ def create_service(payload: schemas.ServiceCreate, db: Session = Depends(get_db)
 
 # ------------------- STATUSES ----------------
 @app.get("/statuses", response_model=List[schemas.Status])
-def list_statuses(db: Session = Depends(get_db)):
-    return crud.get_statuses(db)
+def list_statuses(request: Request, db: Session = Depends(get_db)):
+    etag, version = versions.conditional_counters(db, request, "statuses")
+    # statuses are shared, but their counter is per branch
+    body = reference_cache.get_or_load(
+        f"statuses:{branches.current(db)}", lambda: serialize(crud.get_statuses(db), schemas.Status),
+        version=version,
+    )
+    return Response(content=body, media_type="application/json", headers=versions.etag_headers(etag))
+
+# allowed next statuses per status id (workflow.TRANSITIONS)
+@app.get("/statuses/transitions")
+def status_transitions():
+    return {status_id: sorted(targets) for status_id, targets in workflow.TRANSITIONS.items()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return reference_cache.stats()
 
 # ------------------- ORDERS ------------------
+# Full schemas.Order shape by default; `fields` / `expand` trim it (projection.py).
+# Rows are encoded directly, so the response model below is documentation only.
 @app.get("/orders", response_model=List[schemas.Order])
-def list_orders(db: Session = Depends(get_db)):
-    return crud.get_orders(db)
+def list_orders(
+    request: Request,
+    filters: schemas.OrderFilter = Depends(),
+    page: Page = Depends(),
+    projection: OrderProjection = Depends(),
+    db: Session = Depends(get_db),
+):
+    etag = versions.conditional(db, request, *versions.ORDER_TABLES)
+    rows = crud.get_order_rows(db, projection, filters, page.cursor, page.limit)
+    response = Response(content=dumps(rows), media_type="application/json", headers=versions.etag_headers(etag))
+    set_next_cursor(response, page, rows, "order_id")
+    return response
+
+# Orders still to collect, bucketed overdue / next_hour / today / tomorrow,
+# with a count per bucket (stats.pickup_queue). Declared before
+# /orders/{order_id} so the path is not read as an order id.
+@app.get("/orders/pickup_queue")
+def pickup_queue(limit: int = Query(50, ge=1, le=200), db: Session = Depends(get_db)):
+    return stats.pickup_queue(db, limit)
 
 @app.get("/orders/{order_id}", response_model=schemas.Order)
 def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = crud.get_order(db, order_id)
+    order = crud.get_order_or_archived(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 @app.get("/orders/status/{status_id}", response_model=List[schemas.Order])
-def get_orders_by_status(status_id: int, db: Session = Depends(get_db)):
-    return crud.get_orders_by_status_id(db, status_id)
+def get_orders_by_status(
+    status_id: int,
+    response: Response,
+    page: Page = Depends(),
+    db: Session = Depends(get_db),
+):
+    rows = crud.get_orders_by_status_id(db, status_id, page.cursor, page.limit, load="list")
+    return set_next_cursor(response, page, rows, "order_id")
 
 @app.post("/orders", response_model=schemas.Order)
 def create_order(payload: schemas.OrderCreate, db: Session = Depends(get_db)):
     return crud.create_order(db, payload)
 
+# order + items + payments in one request and one transaction
+@app.post("/orders/full", response_model=schemas.Order)
+def create_order_full(payload: schemas.OrderCreateFull, db: Session = Depends(get_db)):
+    return crud.create_order_full(db, payload)
+
 @app.patch("/orders/{order_id}", response_model=schemas.Order)
 def update_order(
     order_id: int,
@@ -121,18 +275,62 @@ def update_order(
 
 # -------------- FIXED STATUS ENDPOINT -----------------
 # ❗ Your frontend uses PUT + JSON body → THIS is the correct endpoint.
+# Only moves allowed by workflow.TRANSITIONS (422 otherwise); 409 when the
+# order's status changed since `expected_status_id`.
 @app.put("/orders/{order_id}/status")
-def update_order_status(order_id: int, payload: dict, db: Session = Depends(get_db)):
-    status_id = payload.get("status_id")
-    updated = crud.update_order_status(db, order_id, status_id)
+def update_order_status(order_id: int, payload: schemas.OrderStatusUpdate, db: Session = Depends(get_db)):
+    updated = crud.update_order_status(db, order_id, payload.status_id, payload.expected_status_id)
     if not updated:
         raise HTTPException(status_code=404, detail="Order not found")
     return {"message": "Status updated"}
 
+# Move a whole machine load in one transaction. Each order is reported as
+# moved, invalid_transition or not_found; the valid ones move even when
+# others in the batch do not.
+BULK_STATUS_LIMIT = 500
+
+@app.put("/orders/status", response_model=schemas.OrderStatusBulkResult)
+def update_order_status_bulk(payload: schemas.OrderStatusBulkUpdate, db: Session = Depends(get_db)):
+    if not payload.order_ids:
+        raise HTTPException(status_code=422, detail="order_ids is empty")
+    if len(payload.order_ids) > BULK_STATUS_LIMIT:
+        raise HTTPException(status_code=422, detail=f"At most {BULK_STATUS_LIMIT} orders per batch")
+    results = crud.update_order_status_bulk(db, payload.order_ids, payload.status_id)
+    return {
+        "status_id": payload.status_id,
+        "moved": sum(r["result"] == workflow.MOVED for r in results),
+        "results": results,
+    }
+
+@app.get("/orders/{order_id}/history", response_model=List[schemas.OrderStatusHistory])
+def order_status_history(order_id: int, db: Session = Depends(get_db)):
+    return crud.get_order_status_history(db, order_id)
+
+@app.exception_handler(workflow.InvalidTransition)
+def invalid_transition_handler(request: Request, exc: workflow.InvalidTransition):
+    return JSONResponse(status_code=422, content={
+        "detail": str(exc),
+        "from_status_id": exc.from_status_id,
+        "allowed": sorted(workflow.allowed(exc.from_status_id)),
+    })
+
+@app.exception_handler(workflow.StatusConflict)
+def status_conflict_handler(request: Request, exc: workflow.StatusConflict):
+    return JSONResponse(status_code=409, content={
+        "detail": str(exc),
+        "current_status_id": exc.current_status_id,
+    })
+
 # ------------------- ORDER ITEMS -----------------------
 @app.get("/order_items", response_model=List[schemas.OrderItem])
-def list_order_items(db: Session = Depends(get_db)):
-    return crud.get_order_items(db)
+def list_order_items(
+    response: Response,
+    filters: schemas.OrderItemFilter = Depends(),
+    page: Page = Depends(),
+    db: Session = Depends(get_db),
+):
+    rows = crud.get_order_items(db, filters, page.cursor, page.limit)
+    return set_next_cursor(response, page, rows, "item_id")
 
 @app.get("/orders/{order_id}/items", response_model=List[schemas.OrderItem])
 def list_order_items_for_order(order_id: int, db: Session = Depends(get_db)):
@@ -151,8 +349,14 @@ def delete_order_item(item_id: int, db: Session = Depends(get_db)):
 
 # ------------------- PAYMENTS --------------------------
 @app.get("/payments", response_model=List[schemas.Payment])
-def list_payments(db: Session = Depends(get_db)):
-    return crud.get_payments(db)
+def list_payments(
+    response: Response,
+    filters: schemas.PaymentFilter = Depends(),
+    page: Page = Depends(),
+    db: Session = Depends(get_db),
+):
+    rows = crud.get_payments(db, filters, page.cursor, page.limit)
+    return set_next_cursor(response, page, rows, "payment_id")
 
 @app.get("/orders/{order_id}/payments", response_model=List[schemas.Payment])
 def list_payments_for_order(order_id: int, db: Session = Depends(get_db)):
@@ -169,69 +373,78 @@ def delete_payment(payment_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Payment not found")
     return {"message": "Payment deleted"}
 
-# ------------------- DASHBOARD STATS --------------------
-from sqlalchemy import func
+# ------------------- LIVE EVENTS -----------------------
+# Server-Sent Events feed of order / payment changes for the dashboard.
+@app.get("/events")
+async def event_stream(request: Request, branch_id: int = Depends(known_branch)):
+    return StreamingResponse(
+        events.stream(request, branch_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ------------------- EXPORT ----------------------------
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+@app.get("/export/{dataset}")
+def export_dataset(
+    dataset: Literal["orders", "payments", "customers"],
+    format: Literal["csv", "ndjson"] = "csv",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status_id: Optional[int] = None,
+    branch_id: int = Depends(known_branch),
+):
+    stmt = export.EXPORTS[dataset](branch_id, date_from, date_to, status_id)
+    return StreamingResponse(
+        export.stream_rows(stmt, format, branch_id),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
 
+# ------------------- DASHBOARD STATS --------------------
 @app.get("/stats/summary")
 def stats_summary(db: Session = Depends(get_db)):
-    total_orders = db.query(models.Order).count()
-
-    total_revenue = db.query(func.sum(models.Payment.amount)).scalar() or 0
-
-    today = func.date(func.now())
-    today_revenue = (
-        db.query(func.sum(models.Payment.amount))
-        .filter(func.date(models.Payment.pay_datetime) == today)
-        .scalar()
-        or 0
-    )
+    return stats.summary(db)
 
-    pending = db.query(models.Order).filter(models.Order.status_id == 1).count()
-    washing = db.query(models.Order).filter(models.Order.status_id == 2).count()
-    drying = db.query(models.Order).filter(models.Order.status_id == 3).count()
-    ironing = db.query(models.Order).filter(models.Order.status_id == 4).count()
-    ready = db.query(models.Order).filter(models.Order.status_id == 5).count()
-    picked_up = db.query(models.Order).filter(models.Order.status_id == 6).count()
 
-    return {
-        "total_orders": total_orders,
-        "total_revenue": total_revenue,
-        "today_revenue": today_revenue,
-        "pending": pending,
-        "washing": washing,
-        "drying": drying,
-        "ironing": ironing,
-        "ready": ready,
-        "picked_up": picked_up,
-    }
+# Cards, status chart, 7-day revenue and the two order tables in one call.
+@app.get("/summary/dashboard")
+def summary_dashboard(
+    pending_limit: int = Query(20, ge=1, le=100),
+    pickup_limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    return stats.dashboard(db, pending_limit, pickup_limit)
 
 
 @app.get("/stats/orders_by_status")
 def stats_orders_by_status(db: Session = Depends(get_db)):
-    rows = (
-        db.query(models.Status.status_name, func.count(models.Order.order_id))
-        .join(models.Order, models.Status.status_id == models.Order.status_id)
-        .group_by(models.Status.status_name)
-        .all()
-    )
-
-    return [{"status": r[0], "count": r[1]} for r in rows]
+    return [
+        {"status": name, "count": count}
+        for _, name, count in stats.status_counts(db)
+    ]
 
 
 @app.get("/stats/revenue_7_days")
 def stats_revenue_last7(db: Session = Depends(get_db)):
-    rows = (
-        db.query(
-            func.date(models.Payment.pay_datetime),
-            func.sum(models.Payment.amount)
-        )
-        .group_by(func.date(models.Payment.pay_datetime))
-        .order_by(func.date(models.Payment.pay_datetime).desc())
-        .limit(7)
-        .all()
-    )
-
     return [
-        {"date": str(row[0]), "amount": row[1] or 0}
-        for row in rows
+        {"date": day["date"], "amount": day["amount"]}
+        for day in rollups.revenue_series(db, days=7)
     ]
+
+
+@app.get("/stats/turnaround")
+def stats_turnaround(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+):
+    return stats.turnaround(db, days)
+
+
+@app.get("/stats/revenue_daily")
+def stats_revenue_daily(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+):
+    return rollups.revenue_series(db, days=days)
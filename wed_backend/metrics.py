@@ -0,0 +1,271 @@
+# metrics.py
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from cache import reference_cache
+
+# ---------- Per-request instrumentation ----------
+# Engine events count every statement, its time and the rows it touched into
+# the RequestStats of the request that issued it (tracked with a contextvar,
+# which also follows sync routes onto the threadpool). The HTTP middleware in
+# main.py opens and records one RequestStats per request; InstrumentedRoute
+# times the endpoint itself and the response serialization after it, and
+# routes that encode their own body time it with `serializing()`.
+# Everything is exposed as Prometheus text on /metrics.
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_seconds", "rows", "endpoint_seconds", "endpoint_end", "serialize_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.endpoint_seconds = 0.0
+        self.endpoint_end = None
+        self.serialize_seconds = 0.0
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def start_request() -> Tuple[RequestStats, contextvars.Token]:
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+def end_request(token: contextvars.Token):
+    _current.reset(token)
+
+
+# ---------- Registry ----------
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, help, {labels: value | Histogram})
+        self._metrics: Dict[str, Tuple[str, str, dict]] = {}
+        self._buckets: Dict[str, tuple] = {}
+
+    def declare(self, name: str, kind: str, help_text: str, buckets: tuple = None):
+        self._metrics[name] = (kind, help_text, {})
+        if buckets:
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            series = self._metrics[name][2]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            series = self._metrics[name][2]
+            if labels not in series:
+                series[labels] = Histogram(self._buckets[name])
+            series[labels].observe(value)
+
+    def render(self, gauges: Dict[str, Tuple[str, Dict[tuple, float]]]) -> str:
+        # gauges: name -> (help, {((label, value), ...): sample})
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, series) in self._metrics.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind == "histogram":
+                        for upper, count in zip(value.buckets, value.counts):
+                            lines.append(f"{name}_bucket{_labels(labels, le=_num(upper))} {count}")
+                        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {value.total}')
+                        lines.append(f"{name}_sum{_labels(labels)} {_num(value.sum)}")
+                        lines.append(f"{name}_count{_labels(labels)} {value.total}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        for name, (help_text, samples) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(samples.items()):
+                lines.append(f"{name}{_labels((), **dict(labels))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+ROUTE_LABELS = ("method", "route")
+
+def _labels(values: tuple, **extra) -> str:
+    pairs = list(zip(ROUTE_LABELS + ("status",), values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+registry.declare("laundry_http_requests_total", "counter", "HTTP requests by route and status.")
+registry.declare("laundry_http_request_duration_seconds", "histogram", "Total request time.", DURATION_BUCKETS)
+registry.declare("laundry_db_queries_per_request", "histogram", "SQL statements issued per request.", COUNT_BUCKETS)
+registry.declare("laundry_db_time_per_request_seconds", "histogram", "Time spent executing SQL per request.", DURATION_BUCKETS)
+registry.declare("laundry_db_rows_total", "counter", "Rows returned or affected by SQL, by route (where the driver reports it).")
+registry.declare("laundry_serialize_duration_seconds", "histogram", "Response validation and JSON encoding.", DURATION_BUCKETS)
+registry.declare("laundry_db_pool_checkout_wait_seconds", "histogram", "Time to get a connection from the pool.", DURATION_BUCKETS)
+registry.declare("laundry_db_queries_total", "counter", "SQL statements issued, including outside requests.")
+
+def record_request(method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    labels = (method, route)
+    registry.inc("laundry_http_requests_total", labels + (str(status),))
+    registry.observe("laundry_http_request_duration_seconds", labels, seconds)
+    registry.observe("laundry_db_queries_per_request", labels, stats.queries)
+    registry.observe("laundry_db_time_per_request_seconds", labels, stats.sql_seconds)
+    registry.inc("laundry_db_rows_total", labels, stats.rows)
+    if stats.endpoint_end is not None:
+        registry.observe("laundry_serialize_duration_seconds", labels, stats.serialize_seconds)
+
+
+# ---------- Engine / pool hooks ----------
+
+_engines = []
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        registry.inc("laundry_db_queries_total")
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+            stats.rows += max(cursor.rowcount, 0)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        # a statement that raised never reaches after_cursor_execute; its
+        # start would stay on the connection (pooled, so for good)
+        conn = exception_context.connection
+        if conn is not None and exception_context.execution_context is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    # Pool events only fire after a connection is handed out, so the wait is
+    # measured around the pool's own connect().
+    pool = engine.pool
+    connect = pool.connect
+
+    @functools.wraps(connect)
+    def timed_connect(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return connect(*args, **kwargs)
+        finally:
+            registry.observe("laundry_db_pool_checkout_wait_seconds", (), time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    _engines.append(engine)
+
+def pool_gauges() -> Dict[str, Tuple[str, Dict[tuple, float]]]:
+    # one series per engine (primary, replicas, shards), labelled with its
+    # URL minus the password
+    gauges = {}
+    for engine in _engines:
+        pool = engine.pool
+        labels = (("engine", engine.url.render_as_string(hide_password=True)),)
+        # StaticPool / SingletonThreadPool (SQLite) have no size accounting
+        # (SingletonThreadPool.size is a plain setting)
+        for attr, help_text in (("size", "Configured pool size."),
+                                ("checkedout", "Connections currently checked out."),
+                                ("overflow", "Connections opened beyond the pool size."),
+                                ("checkedin", "Idle connections in the pool.")):
+            reading = getattr(pool, attr, None)
+            if callable(reading):
+                gauges.setdefault(f"laundry_db_pool_{attr}", (help_text, {}))[1][labels] = reading()
+    return gauges
+
+def render() -> str:
+    gauges = pool_gauges()
+    cache_stats = reference_cache.stats()
+    gauges["laundry_reference_cache_hits"] = ("Reference cache hits since start.", {(): cache_stats["hits"]})
+    gauges["laundry_reference_cache_misses"] = ("Reference cache misses since start.", {(): cache_stats["misses"]})
+    return registry.render(gauges)
+
+
+# ---------- Route class ----------
+
+class InstrumentedRoute(APIRoute):
+    # Times the endpoint function itself, and what FastAPI does between its
+    # return and the response (response_model validation, JSON encoding).
+    # Dependency setup and teardown are in neither.
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        @functools.wraps(handler)
+        async def timed_handler(request):
+            response = await handler(request)
+            stats = _current.get()
+            if stats is not None and stats.endpoint_end is not None:
+                stats.serialize_seconds += time.perf_counter() - stats.endpoint_end
+            return response
+        return timed_handler
+
+def _timed_endpoint(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _add_endpoint_time(time.perf_counter() - start)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _add_endpoint_time(time.perf_counter() - start)
+    return timed
+
+def _add_endpoint_time(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.endpoint_seconds += seconds
+        stats.endpoint_end = time.perf_counter()
+
+@contextmanager
+def serializing():
+    # for endpoints that encode their own response body (projection.dumps)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - start
@@ -0,0 +1,336 @@
+# migrations.py
+#
+#   python migrations.py upgrade     apply pending migrations
+#   python migrations.py current     print the schema version
+#
+# Versioned schema migrations. The API no longer creates tables at import;
+# run `upgrade` once per deploy instead, so workers boot without touching
+# the schema and new indexes/columns reach existing databases.
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import models, rollups, search
+
+version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# ---------- Helpers ----------
+# Migrations are written to be safe to re-run: databases created by the old
+# create_all-at-import may already have some of these objects.
+
+def create_table(conn: Connection, model):
+    if not inspect(conn).has_table(model.__tablename__):
+        model.__table__.create(conn)
+
+def add_column(conn: Connection, model, name: str):
+    table = model.__table__
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    if name in existing:
+        return
+    column = table.c[name]
+    ddl_type = column.type.compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}")
+
+def create_index(conn: Connection, model, name: str):
+    # model: a mapped class or a plain Table (the archive tables)
+    table = getattr(model, "__table__", model)
+    existing = {i["name"] for i in inspect(conn).get_indexes(table.name)}
+    if name in existing:
+        return
+    index = next((i for i in table.indexes if i.name == name), None)
+    if index is None:
+        # replaced by a later migration; a table created from the current
+        # model already has the replacement
+        return
+    index.create(conn)
+
+def drop_index(conn: Connection, table_name: str, name: str):
+    existing = {i["name"] for i in inspect(conn).get_indexes(table_name)}
+    if name not in existing:
+        return
+    try:
+        conn.exec_driver_sql(f"DROP INDEX {name} ON {table_name}")
+    except OperationalError as exc:
+        # MySQL 1553: the index is the only one backing a foreign key; it
+        # stays, it is still needed
+        if exc.orig.args[0] != 1553:
+            raise
+
+def add_main_branch(conn: Connection):
+    # branch 1, which rows default to
+    branch = models.Branch.__table__
+    if conn.execute(select(branch.c.branch_id).where(branch.c.branch_id == 1)).scalar() is None:
+        conn.execute(branch.insert().values(branch_id=1, branch_name="Main", created_at=datetime.now()))
+
+def rebuild_table(conn: Connection, model):
+    # SQLite cannot change a column in place: move the rows into a freshly
+    # created table (with the model's current columns and indexes); columns
+    # new to the model get their defaults. Foreign keys are off for the copy:
+    # files written before they were enforced may hold orphaned rows. The
+    # legacy rename leaves other tables' REFERENCES pointing at the original
+    # name rather than following the table to `<name>_old`.
+    table = getattr(model, "__table__", model)
+    old_columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+    for index in inspect(conn).get_indexes(table.name):
+        conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {table.name}_old")
+    table.create(conn)
+    columns = ", ".join(c.name for c in table.columns if c.computed is None and c.name in old_columns)
+    conn.exec_driver_sql(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}_old")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+    conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+# ---------- Migrations ----------
+
+def m0001_baseline(conn: Connection):
+    # customers, statuses, services, orders, order_items, payments as the old
+    # create_all at import produced them (on a new database: as the models
+    # are now, so branches comes first for their foreign keys)
+    create_table(conn, models.Branch)
+    add_main_branch(conn)
+    for model in (models.Customer, models.Status, models.Service, models.Order, models.OrderItem, models.Payment):
+        create_table(conn, model)
+
+def m0002_rollup_and_search(conn: Connection):
+    # empty until migration 11 fills them from the rows already there
+    create_table(conn, models.DailyRevenue)
+    add_column(conn, models.Customer, "phone_digits")
+    add_column(conn, models.Customer, "name_key")
+    create_index(conn, models.Customer, "ix_customers_phone_digits")
+    create_index(conn, models.Customer, "ix_customers_name_key")
+    create_table(conn, models.CustomerSearchGram)
+
+def m0003_secondary_indexes(conn: Connection):
+    for name in ("ix_orders_status_order", "ix_orders_status_pickup", "ix_orders_customer_order",
+                 "ix_orders_pickup_due", "ix_orders_dropoff"):
+        create_index(conn, models.Order, name)
+    create_index(conn, models.OrderItem, "ix_order_items_order")
+    create_index(conn, models.Payment, "ix_payments_order")
+    create_index(conn, models.Payment, "ix_payments_pay_datetime")
+
+def m0004_table_versions(conn: Connection):
+    create_table(conn, models.TableVersion)
+    table = models.TableVersion.__table__
+    existing = set(conn.execute(select(table.c.table_name)).scalars())
+    missing = [name for name in models.VERSIONED_TABLES if name not in existing]
+    if missing:
+        conn.execute(table.insert(), [{"table_name": name, "version": 0} for name in missing])
+
+def m0005_generated_item_amount(conn: Connection):
+    # The shop's MySQL schema already generates order_items.amount; tables
+    # made by the old create_all have a plain column the app never filled.
+    amount = next(c for c in inspect(conn).get_columns("order_items") if c["name"] == "amount")
+    if amount.get("computed"):
+        return
+    if conn.dialect.name == "sqlite":
+        rebuild_table(conn, models.OrderItem)
+    else:
+        column = models.OrderItem.__table__.c.amount
+        ddl_type = column.type.compile(dialect=conn.dialect)
+        conn.exec_driver_sql(
+            f"ALTER TABLE order_items MODIFY amount {ddl_type} GENERATED ALWAYS AS (qty * unit_price) STORED"
+        )
+
+def m0006_status_history(conn: Connection):
+    create_table(conn, models.OrderStatusHistory)
+
+def m0007_order_totals(conn: Connection):
+    existing = {c["name"] for c in inspect(conn).get_columns("orders")}
+    if "unpaid" not in existing:
+        if conn.dialect.name == "sqlite":
+            # SQLite cannot ADD a stored generated column
+            rebuild_table(conn, models.Order)
+        else:
+            ddl_type = models.Order.__table__.c.total_amount.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(
+                f"ALTER TABLE orders"
+                f" ADD COLUMN total_amount {ddl_type} NOT NULL DEFAULT 0,"
+                f" ADD COLUMN paid_amount {ddl_type} NOT NULL DEFAULT 0,"
+                f" ADD COLUMN balance {ddl_type} GENERATED ALWAYS AS (total_amount - paid_amount) STORED,"
+                f" ADD COLUMN unpaid BOOLEAN GENERATED ALWAYS AS (total_amount - paid_amount >= 0.01) STORED"
+            )
+    create_index(conn, models.Order, "ix_orders_unpaid_order")
+    # backfill from the existing items and payments
+    conn.execute(rollups.order_totals_update())
+
+def m0008_archive_tables(conn: Connection):
+    for table in (models.orders_archive, models.order_items_archive,
+                  models.payments_archive, models.order_status_history_archive):
+        table.create(conn, checkfirst=True)
+
+# Every branch-owned table gets branch_id; rows already there belong to
+# branch 1. Indexes that led with status / dates are replaced by the same
+# ones led by branch_id, lookups by order / customer get branch_id second
+# (models.py).
+BRANCH_TABLES = (
+    models.Customer, models.Service, models.Order, models.OrderItem, models.Payment,
+    models.OrderStatusHistory, models.DailyRevenue, models.TableVersion,
+    models.orders_archive, models.order_items_archive, models.payments_archive,
+    models.order_status_history_archive,
+)
+REPLACED_INDEXES = {
+    "customers": ("ix_customers_phone_digits", "ix_customers_name_key"),
+    "orders": ("ix_orders_status_order", "ix_orders_status_pickup", "ix_orders_customer_order",
+               "ix_orders_pickup_due", "ix_orders_dropoff", "ix_orders_unpaid_order"),
+    "order_items": ("ix_order_items_order",),
+    "payments": ("ix_payments_order", "ix_payments_pay_datetime"),
+    "order_status_history": ("ix_status_history_order", "ix_status_history_changed"),
+    "orders_archive": ("ix_orders_archive_dropoff",),
+    "payments_archive": ("ix_payments_archive_pay_datetime",),
+    "order_status_history_archive": ("ix_status_history_archive_order", "ix_status_history_archive_changed"),
+}
+
+def add_branch_id(conn: Connection, model):
+    # branch_id on a table that predates it; its rows go to branch 1
+    table = getattr(model, "__table__", model)
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    if "branch_id" in existing:
+        return
+    if conn.dialect.name == "sqlite":
+        # also swaps the indexes for the model's
+        rebuild_table(conn, table)
+        return
+    alter = "ADD COLUMN branch_id INT NOT NULL DEFAULT 1"
+    if table.name in ("daily_revenue", "table_versions"):
+        key = ", ".join(c.name for c in table.primary_key.columns)
+        alter += f", DROP PRIMARY KEY, ADD PRIMARY KEY ({key})"
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} {alter}")
+    # the new indexes first, so the foreign key uses one of them
+    for index in table.indexes:
+        create_index(conn, table, index.name)
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table.name} ADD FOREIGN KEY (branch_id) REFERENCES branches (branch_id)"
+    )
+    for name in REPLACED_INDEXES.get(table.name, ()):
+        drop_index(conn, table.name, name)
+
+def m0009_branches(conn: Connection):
+    create_table(conn, models.Branch)
+    for model in BRANCH_TABLES:
+        add_branch_id(conn, model)
+
+    # only now: SQLite ignores rebuild_table's foreign_keys=OFF once the
+    # transaction has written a row
+    add_main_branch(conn)
+
+def m0010_round_item_amount(conn: Connection):
+    # MySQL rounds qty * unit_price into the DECIMAL(10,2) column, SQLite
+    # stored it unrounded (0.5 kg at 12.99: 6.495), so API responses and
+    # order totals, which add crud.item_amount, drifted from the stored items
+    amount = next(c for c in inspect(conn).get_columns("order_items") if c["name"] == "amount")
+    if "round" in str((amount.get("computed") or {}).get("sqltext", "")).lower():
+        return
+    if conn.dialect.name == "sqlite":
+        rebuild_table(conn, models.OrderItem)
+        archived = models.order_items_archive
+        conn.execute(archived.update().values(amount=func.round(archived.c.amount, 2)))
+    else:
+        column = models.OrderItem.__table__.c.amount
+        ddl_type = column.type.compile(dialect=conn.dialect)
+        conn.exec_driver_sql(
+            f"ALTER TABLE order_items MODIFY amount {ddl_type}"
+            f" GENERATED ALWAYS AS (ROUND(qty * unit_price, 2)) STORED"
+        )
+    conn.execute(rollups.order_totals_update())
+
+def m0011_backfill_rollup_and_search(conn: Connection):
+    # Migration 2 left daily_revenue and the customer search keys empty for
+    # existing rows. Filled here rather than there: the rebuilds read the
+    # current schema (branch_id, archived payments). Both start from scratch,
+    # so a database that was already filled by hand comes out the same.
+    # The grams are written with their customer's branch: the column comes
+    # here for databases past migration 9 (migration 12 for those past 11).
+    add_branch_id(conn, models.CustomerSearchGram)
+    db = Session(bind=conn)
+    try:
+        search.reindex_customers(db)
+        rollups.rebuild_daily_revenue(db)
+    finally:
+        db.close()
+
+def m0012_branch_search_grams(conn: Connection):
+    # grams written before they carried a branch: they take their customer's
+    add_branch_id(conn, models.CustomerSearchGram)
+    grams = models.CustomerSearchGram.__table__
+    customers = models.Customer.__table__
+    conn.execute(grams.update().values(branch_id=(
+        select(customers.c.branch_id)
+        .where(customers.c.customer_id == grams.c.customer_id)
+        .scalar_subquery()
+    )))
+
+MIGRATIONS = [
+    (1, "baseline tables", m0001_baseline),
+    (2, "daily_revenue rollup and customer search keys", m0002_rollup_and_search),
+    (3, "secondary indexes for status, pickup, customer and payment queries", m0003_secondary_indexes),
+    (4, "table_versions change counters for ETags", m0004_table_versions),
+    (5, "order_items.amount as a stored generated column", m0005_generated_item_amount),
+    (6, "order_status_history", m0006_status_history),
+    (7, "orders.total_amount / paid_amount / balance / unpaid", m0007_order_totals),
+    (8, "archive tables for picked-up orders", m0008_archive_tables),
+    (9, "branches: branch_id on branch-owned tables", m0009_branches),
+    (10, "order_items.amount rounded to cents", m0010_round_item_amount),
+    (11, "backfill daily_revenue and customer search keys", m0011_backfill_rollup_and_search),
+    (12, "branch_id on customer_search_grams", m0012_branch_search_grams),
+]
+
+
+# ---------- Runner ----------
+
+def current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(version_table.name):
+        return 0
+    return conn.execute(select(version_table.c.version).order_by(version_table.c.version.desc())).scalar() or 0
+
+def upgrade(engine: Engine) -> list:
+    applied = []
+    with engine.begin() as conn:
+        version_table.create(conn, checkfirst=True)
+        version = current_version(conn)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        # one transaction per migration (MySQL DDL still auto-commits, which
+        # is why migrations are written to be re-runnable)
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(version_table.insert().values(
+                version=number, description=description, applied_at=datetime.now()
+            ))
+        applied.append(number)
+    return applied
+
+
+if __name__ == "__main__":
+    # the main database and every branch shard (database.BRANCH_SHARDS)
+    from database import all_engines
+
+    engines = all_engines()
+    def label(engine):
+        return f"{engine.url.render_as_string()}: " if len(engines) > 1 else ""
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "upgrade":
+        for engine in engines:
+            applied = upgrade(engine)
+            print(label(engine) + (f"applied migrations: {applied}" if applied else "schema is up to date"))
+    elif command == "current":
+        for engine in engines:
+            with engine.connect() as conn:
+                print(label(engine) + str(current_version(conn)))
+    else:
+        sys.exit("usage: python migrations.py upgrade|current")
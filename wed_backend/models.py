@@ -1,19 +1,71 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, DECIMAL, Enum
-from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, Computed, Integer, String, Table, Text, Date, DateTime, ForeignKey, DECIMAL, Enum, Index
+from sqlalchemy.orm import declared_attr, relationship
 from sqlalchemy.sql import func
 from database import Base
 
-class Customer(Base):
+PAYMENT_METHODS = ("cash", "qr", "transfer", "card")
+
+# ---------- Branches ----------
+# Every row a branch owns carries its branch_id, and the indexes its lists
+# and ranges use lead with it. Lookups by parent (an order's items, a
+# customer's orders) lead with the parent id, which the foreign key needs,
+# and carry branch_id second: every scoped query has both equalities, and an
+# index matching two of them is never mistaken for one matching only the
+# branch. Requests only ever see their own branch (branches.py). Rows from
+# before branches existed belong to branch 1.
+
+class Branch(Base):
+    __tablename__ = "branches"
+
+    branch_id = Column(Integer, primary_key=True, autoincrement=False)
+    branch_name = Column(String(80), nullable=False)
+    created_at = Column(DateTime, default=datetime.now, server_default=func.now())
+
+
+class BranchOwned:
+    @declared_attr
+    def branch_id(cls):
+        return Column(Integer, ForeignKey("branches.branch_id"), nullable=False, server_default="1")
+
+
+class Customer(BranchOwned, Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        Index("ix_customers_branch_customer", "branch_id", "customer_id"),
+        Index("ix_customers_branch_phone", "branch_id", "phone_digits"),
+        Index("ix_customers_branch_name", "branch_id", "name_key"),
+    )
 
     customer_id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String(120), nullable=False)
     phone = Column(String(20))
     line_id = Column(String(50))
     address = Column(Text)
-    created_at = Column(DateTime, server_default=func.now())
+    # set client-side so an insert needs no read-back; server_default
+    # still covers rows written with plain SQL
+    created_at = Column(DateTime, default=datetime.now, server_default=func.now())
+    # Search keys maintained by search.index_customer
+    phone_digits = Column(String(20))
+    name_key = Column(String(120))
 
     orders = relationship("Order", back_populates="customer")
+    search_grams = relationship("CustomerSearchGram", cascade="all, delete-orphan")
+
+
+class CustomerSearchGram(BranchOwned, Base):
+    # Trigram index over Customer.name_key. Works for Thai names too, since
+    # grams are taken over characters rather than space-separated words.
+    # Carries its customer's branch, so a search reads only that branch's
+    # grams.
+    __tablename__ = "customer_search_grams"
+    __table_args__ = (
+        Index("ix_customer_search_grams_branch_gram", "branch_id", "gram", "customer_id"),
+    )
+
+    gram = Column(String(3), primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.customer_id"), primary_key=True, index=True)
 
 
 class Status(Base):
@@ -25,8 +77,12 @@ class Status(Base):
     orders = relationship("Order", back_populates="status")
 
 
-class Service(Base):
+class Service(BranchOwned, Base):
+    # each branch keeps its own price list
     __tablename__ = "services"
+    __table_args__ = (
+        Index("ix_services_branch", "branch_id", "service_id"),
+    )
 
     service_id = Column(Integer, primary_key=True, index=True)
     service_name = Column(String(80), nullable=False)
@@ -36,8 +92,21 @@ class Service(Base):
     items = relationship("OrderItem", back_populates="service")
 
 
-class Order(Base):
+class Order(BranchOwned, Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # unfiltered keyset pages
+        Index("ix_orders_branch_order", "branch_id", "order_id"),
+        # list-by-status keyset pages and the stats GROUP BY
+        Index("ix_orders_branch_status_order", "branch_id", "status_id", "order_id"),
+        # pickup queue: "not picked up, due before X"
+        Index("ix_orders_branch_status_pickup", "branch_id", "status_id", "pickup_due_datetime"),
+        Index("ix_orders_customer_branch_order", "customer_id", "branch_id", "order_id"),
+        Index("ix_orders_branch_pickup_due", "branch_id", "pickup_due_datetime"),
+        Index("ix_orders_branch_dropoff", "branch_id", "dropoff_datetime"),
+        # /orders?unpaid=true keyset pages
+        Index("ix_orders_branch_unpaid_order", "branch_id", "unpaid", "order_id"),
+    )
 
     order_id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.customer_id"), nullable=False)
@@ -45,16 +114,29 @@ class Order(Base):
     dropoff_datetime = Column(DateTime, nullable=False)
     pickup_due_datetime = Column(DateTime)
     notes = Column(Text)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, default=datetime.now, server_default=func.now())
+    # Running sums of the order's items and payments, kept by crud through
+    # rollups.add_order_amounts; `python rollups.py check-totals` verifies them.
+    total_amount = Column(DECIMAL(10, 2), nullable=False, default=0, server_default="0")
+    paid_amount = Column(DECIMAL(10, 2), nullable=False, default=0, server_default="0")
+    balance = Column(DECIMAL(10, 2), Computed("total_amount - paid_amount", persisted=True))
+    # owes at least one satang; a flag rather than `balance > 0` so the
+    # filter is an equality and the index also gives the page order
+    unpaid = Column(Boolean, Computed("total_amount - paid_amount >= 0.01", persisted=True))
 
     customer = relationship("Customer", back_populates="orders")
     status = relationship("Status", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     payments = relationship("Payment", back_populates="order", cascade="all, delete-orphan")
+    status_history = relationship("OrderStatusHistory", cascade="all, delete-orphan")
 
 
-class OrderItem(Base):
+class OrderItem(BranchOwned, Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_branch", "order_id", "branch_id"),
+        Index("ix_order_items_branch_item", "branch_id", "item_id"),
+    )
 
     item_id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.order_id"), nullable=False)
@@ -62,21 +144,118 @@ class OrderItem(Base):
     item_desc = Column(String(120))
     qty = Column(DECIMAL(10, 2), nullable=False)
     unit_price = Column(DECIMAL(10, 2), nullable=False)
-    # MySQL generates this; we still map it so we can read it
-    amount = Column(DECIMAL(10, 2))
+    # Stored generated column (GENERATED ALWAYS AS ... STORED), which MySQL,
+    # SQLite >= 3.31 and PostgreSQL all support; never written by the app.
+    # Rounded explicitly: SQLite keeps qty * unit_price unrounded.
+    amount = Column(DECIMAL(10, 2), Computed("ROUND(qty * unit_price, 2)", persisted=True))
 
     order = relationship("Order", back_populates="items")
     service = relationship("Service", back_populates="items")
 
 
-class Payment(Base):
+class Payment(BranchOwned, Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_order_branch", "order_id", "branch_id"),
+        Index("ix_payments_branch_pay_datetime", "branch_id", "pay_datetime"),
+        Index("ix_payments_branch_payment", "branch_id", "payment_id"),
+    )
 
     payment_id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.order_id"), nullable=False)
     pay_datetime = Column(DateTime, nullable=False)
-    method = Column(Enum("cash", "qr", "transfer", "card"), nullable=False)
+    method = Column(Enum(*PAYMENT_METHODS), nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     remark = Column(String(120))
 
     order = relationship("Order", back_populates="payments")
+
+
+class DailyRevenue(BranchOwned, Base):
+    # Rollup of payments per branch, calendar day and method, kept in step by
+    # crud.create_payment / delete_payment (see rollups.py).
+    __tablename__ = "daily_revenue"
+
+    branch_id = Column(Integer, ForeignKey("branches.branch_id"), primary_key=True, server_default="1")
+    day = Column(Date, primary_key=True)
+    method = Column(Enum(*PAYMENT_METHODS), primary_key=True)
+    amount = Column(DECIMAL(12, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
+
+class TableVersion(BranchOwned, Base):
+    # Change counter per branch and table, bumped by the crud write functions
+    # in the same transaction as the change. GET endpoints build their ETag
+    # from it (see versions.py).
+    __tablename__ = "table_versions"
+
+    branch_id = Column(Integer, ForeignKey("branches.branch_id"), primary_key=True, server_default="1")
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+VERSIONED_TABLES = ("customers", "statuses", "services", "orders", "order_items", "payments")
+
+
+class OrderStatusHistory(BranchOwned, Base):
+    # One row per status change (from_status_id is NULL for the status an
+    # order was created with), written by crud in the same transaction as
+    # the change. Source for per-stage turnaround times.
+    __tablename__ = "order_status_history"
+    __table_args__ = (
+        Index("ix_status_history_order_branch", "order_id", "branch_id", "changed_at"),
+        Index("ix_status_history_branch_changed", "branch_id", "changed_at"),
+    )
+
+    history_id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.order_id"), nullable=False)
+    from_status_id = Column(Integer, ForeignKey("statuses.status_id"))
+    to_status_id = Column(Integer, ForeignKey("statuses.status_id"), nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+
+
+# ---------- Archive ----------
+# Cold copies of settled, picked-up orders, moved out of the hot tables in
+# batches by archive.py. Same columns as the hot tables (generated ones kept
+# as plain values), with references to orders pointing at orders_archive.
+# Operational queries never touch them; exports and historical stats union
+# them with the hot tables (archive.py).
+
+def _archive_table(model, *extra):
+    hot = model.__table__
+    columns = []
+    for column in hot.columns:
+        foreign_keys = [
+            ForeignKey("orders_archive.order_id" if fk.column.table.name == "orders" else fk.target_fullname)
+            for fk in column.foreign_keys
+        ]
+        # server defaults are kept (generated columns aside) so migrations
+        # can fill a new column on rows archived before it existed
+        server_default = None if column.computed is not None or column.server_default is None \
+            else column.server_default.arg
+        columns.append(Column(
+            column.name, column.type.copy(), *foreign_keys,
+            primary_key=column.primary_key, nullable=column.nullable, autoincrement=False,
+            server_default=server_default,
+        ))
+    return Table(f"{hot.name}_archive", Base.metadata, *columns, *extra)
+
+orders_archive = _archive_table(
+    Order,
+    Column("archived_at", DateTime, nullable=False),
+    Index("ix_orders_archive_customer", "customer_id", "order_id"),
+    Index("ix_orders_archive_branch_dropoff", "branch_id", "dropoff_datetime"),
+)
+order_items_archive = _archive_table(
+    OrderItem,
+    Index("ix_order_items_archive_order", "order_id"),
+)
+payments_archive = _archive_table(
+    Payment,
+    Index("ix_payments_archive_order", "order_id"),
+    Index("ix_payments_archive_branch_pay_datetime", "branch_id", "pay_datetime"),
+)
+order_status_history_archive = _archive_table(
+    OrderStatusHistory,
+    Index("ix_status_history_archive_order_branch", "order_id", "branch_id", "changed_at"),
+    Index("ix_status_history_archive_branch_changed", "branch_id", "changed_at"),
+)
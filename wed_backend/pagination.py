@@ -0,0 +1,40 @@
+# pagination.py
+from typing import Optional
+
+from fastapi import Query, Response
+
+# ---------- Keyset pagination ----------
+# Pages are keyed on the primary key, newest first. `cursor` is the last key
+# the client has seen, so every page is an index range scan of `limit` rows no
+# matter how deep the client has paged. Works on both legacy Query objects
+# and 2.0-style select() statements.
+
+DEFAULT_PAGE_SIZE = 100
+# selectinload sends at most 500 ids per IN, so a full page of orders still
+# loads each collection in one query (tests/test_query_counts.py)
+MAX_PAGE_SIZE = 500
+
+def keyset(query, key, cursor: Optional[int], limit: int):
+    if cursor is not None:
+        query = query.filter(key < cursor)
+    return query.order_by(key.desc()).limit(limit)
+
+
+# List endpoints return one page; when more rows may follow, the key to pass
+# back as `cursor` is sent in the X-Next-Cursor header so the body stays a
+# plain list.
+class Page:
+    def __init__(
+        self,
+        cursor: Optional[int] = Query(None, description="last id from the previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+def set_next_cursor(response: Response, page: Page, rows: list, key: str) -> list:
+    if len(rows) == page.limit:
+        last = rows[-1]
+        value = last[key] if isinstance(last, dict) else getattr(last, key)
+        response.headers["X-Next-Cursor"] = str(value)
+    return rows
@@ -0,0 +1,131 @@
+# projection.py
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Query
+
+import metrics, models, schemas
+
+# ---------- Sparse fieldsets ----------
+# `/orders?fields=...&expand=...` lets a list view ask for just the columns it
+# renders. Rows are read as plain tuples (no ORM objects, no Pydantic) and
+# written straight to JSON, which is where most of the time went on large
+# pages. With neither parameter the response has the full schemas.Order shape.
+#
+#   fields=order_id,dropoff_datetime,customer.full_name,status.status_name
+#   expand=customer,items            (all columns of those relations)
+#
+# order_id is always included; it is the pagination key.
+
+def _schema_fields(schema) -> List[str]:
+    fields = getattr(schema, "model_fields", None) or schema.__fields__
+    return list(fields)
+
+# relation -> (model, column names, one-to-many?)
+RELATIONS = {
+    "customer": (models.Customer, _schema_fields(schemas.Customer), False),
+    "status": (models.Status, _schema_fields(schemas.Status), False),
+    "items": (models.OrderItem, _schema_fields(schemas.OrderItem), True),
+    "payments": (models.Payment, _schema_fields(schemas.Payment), True),
+}
+
+ORDER_COLUMNS = [name for name in _schema_fields(schemas.Order) if name not in RELATIONS]
+
+
+class OrderProjection:
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="comma-separated order columns, `relation.column` for related ones"),
+        expand: Optional[str] = Query(None, description="comma-separated relations to include in full: customer, status, items, payments"),
+    ):
+        self.columns: List[str] = ["order_id"]
+        self.relations: Dict[str, List[str]] = {}
+
+        if fields is None and expand is None:
+            self.columns = list(ORDER_COLUMNS)
+            self.relations = {name: list(rel[1]) for name, rel in RELATIONS.items()}
+            return
+
+        if fields is None:
+            self.columns = list(ORDER_COLUMNS)
+        for name in _split(fields):
+            relation, _, column = name.rpartition(".")
+            if not relation:
+                if column not in ORDER_COLUMNS:
+                    raise HTTPException(status_code=422, detail=f"Unknown field: {name}")
+                if column not in self.columns:
+                    self.columns.append(column)
+                continue
+            if relation not in RELATIONS or column not in RELATIONS[relation][1]:
+                raise HTTPException(status_code=422, detail=f"Unknown field: {name}")
+            columns = self.relations.setdefault(relation, [])
+            if column not in columns:
+                columns.append(column)
+
+        for relation in _split(expand):
+            if relation not in RELATIONS:
+                raise HTTPException(status_code=422, detail=f"Unknown relation: {relation}")
+            self.relations[relation] = list(RELATIONS[relation][1])
+
+    def joined(self):
+        # many-to-one relations, read in the main query
+        return [name for name in self.relations if not RELATIONS[name][2]]
+
+    def collections(self):
+        # one-to-many relations, read with one extra query each
+        return [name for name in self.relations if RELATIONS[name][2]]
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+# ---------- Assembling rows ----------
+
+def shape_orders(rows, projection: OrderProjection, children: Dict[str, list]) -> List[dict]:
+    # `rows` come from crud.order_rows_query, whose related columns are
+    # labelled "relation.column"; `children` maps each collection to rows of
+    # (order_id, *columns) from crud.order_children_query.
+    grouped = {}
+    for relation, child_rows in children.items():
+        columns = projection.relations[relation]
+        by_order = defaultdict(list)
+        for row in child_rows:
+            by_order[row[0]].append(dict(zip(columns, row[1:])))
+        grouped[relation] = by_order
+
+    keys = None
+    orders = []
+    for row in rows:
+        if keys is None:
+            keys = [key.partition(".") for key in row._fields]
+        order = {}
+        for (relation, dot, column), value in zip(keys, row):
+            if dot:
+                order.setdefault(relation, {})[column] = value
+            else:
+                order[relation] = value
+        for relation, by_order in grouped.items():
+            order[relation] = by_order.get(order["order_id"], [])
+        orders.append(order)
+    return orders
+
+
+# ---------- JSON ----------
+# Shared by the order lists, the exports (export.py) and the change feed
+# (events.py).
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def dumps(data) -> bytes:
+    with metrics.serializing():
+        return json.dumps(
+            data, default=json_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
@@ -0,0 +1,248 @@
+# rollups.py
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List, Optional
+import sys
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+import archive, branches, models, versions
+
+# ---------- Daily revenue ----------
+# daily_revenue holds one row per (branch, day, method). crud applies every
+# payment insert/delete to it inside the same transaction, so revenue reads
+# cost O(days) instead of scanning payments.
+
+def _upsert_daily_revenue(db: Session, branch_id: int, day: date, method: str, amount: Decimal, count: int):
+    table = models.DailyRevenue.__table__
+    values = {"branch_id": branch_id, "day": day, "method": method, "amount": amount, "payment_count": count}
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            amount=table.c.amount + stmt.inserted.amount,
+            payment_count=table.c.payment_count + stmt.inserted.payment_count,
+        )
+        db.execute(stmt)
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.branch_id, table.c.day, table.c.method],
+            set_={
+                "amount": table.c.amount + stmt.excluded.amount,
+                "payment_count": table.c.payment_count + stmt.excluded.payment_count,
+            },
+        )
+        db.execute(stmt)
+    else:
+        updated = db.execute(
+            table.update()
+            .where(table.c.branch_id == branch_id, table.c.day == day, table.c.method == method)
+            .values(amount=table.c.amount + amount, payment_count=table.c.payment_count + count)
+        ).rowcount
+        if not updated:
+            db.execute(insert(table).values(**values))
+
+def record_payment(db: Session, payment: models.Payment):
+    _upsert_daily_revenue(
+        db, payment.branch_id, payment.pay_datetime.date(), payment.method, Decimal(str(payment.amount)), 1
+    )
+
+def record_payments(db: Session, payments: List[dict]):
+    # Several payments at once (nested order create): one upsert per
+    # (branch, day, method) rather than per payment.
+    totals = {}
+    for p in payments:
+        key = (p["branch_id"], p["pay_datetime"].date(), p["method"])
+        amount, count = totals.get(key, (Decimal(0), 0))
+        totals[key] = (amount + Decimal(str(p["amount"])), count + 1)
+    for (branch_id, day, method), (amount, count) in sorted(totals.items()):
+        _upsert_daily_revenue(db, branch_id, day, method, amount, count)
+
+def unrecord_payment(db: Session, payment: models.Payment):
+    _upsert_daily_revenue(
+        db, payment.branch_id, payment.pay_datetime.date(), payment.method, -Decimal(str(payment.amount)), -1
+    )
+
+def rebuild_daily_revenue(db: Session) -> int:
+    # Backfill / repair: recompute the rollup from payments, archived ones
+    # included; every branch, or only the session's one.
+    table = models.DailyRevenue.__table__
+    branch_id = branches.scope(db)
+
+    def build(tables):
+        payment = tables["payments"]
+        stmt = select(payment.c.branch_id, payment.c.pay_datetime, payment.c.method, payment.c.amount)
+        return stmt if branch_id is None else stmt.where(payment.c.branch_id == branch_id)
+
+    payments = archive.union_sides(build).subquery()
+    day = func.date(payments.c.pay_datetime)
+    delete = table.delete()
+    db.execute(delete if branch_id is None else delete.where(table.c.branch_id == branch_id))
+    db.execute(
+        insert(table).from_select(
+            ["branch_id", "day", "method", "amount", "payment_count"],
+            select(
+                payments.c.branch_id,
+                day,
+                payments.c.method,
+                func.sum(payments.c.amount),
+                func.count(),
+            ).group_by(payments.c.branch_id, day, payments.c.method),
+        )
+    )
+    db.commit()
+    return db.query(func.count()).select_from(models.DailyRevenue).scalar()
+
+
+# ---------- Order totals ----------
+# orders.total_amount and paid_amount are running sums of the order's items
+# and payments; balance is generated from the two. crud applies every item
+# and payment insert/delete as an increment in the same transaction, so
+# concurrent writes to one order add up instead of overwriting each other.
+
+def add_order_amounts(
+    db: Session, order_id: int, total: Decimal = Decimal(0), paid: Decimal = Decimal(0)
+) -> Optional[int]:
+    # Returns the number of orders updated (0: not in the session's branch),
+    # or None when there was nothing to add.
+    values = {}
+    if total:
+        values["total_amount"] = models.Order.total_amount + total
+    if paid:
+        values["paid_amount"] = models.Order.paid_amount + paid
+    if not values:
+        return None
+    return db.execute(
+        update(models.Order)
+        .where(models.Order.order_id == order_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def unpaid_filter(unpaid: bool = True):
+    # served by ix_orders_branch_unpaid_order
+    return models.Order.unpaid == unpaid
+
+def _expected_totals():
+    items = (
+        select(func.coalesce(func.sum(models.OrderItem.amount), 0))
+        .where(models.OrderItem.order_id == models.Order.order_id)
+        .scalar_subquery()
+    )
+    paid = (
+        select(func.coalesce(func.sum(models.Payment.amount), 0))
+        .where(models.Payment.order_id == models.Order.order_id)
+        .scalar_subquery()
+    )
+    return items, paid
+
+def _totals_differ(items, paid):
+    return or_(
+        func.round(models.Order.total_amount - items, 2) != 0,
+        func.round(models.Order.paid_amount - paid, 2) != 0,
+    )
+
+def order_totals_mismatch_query(limit: Optional[int] = None):
+    items, paid = _expected_totals()
+    stmt = (
+        select(
+            models.Order.order_id,
+            models.Order.total_amount,
+            items.label("items_total"),
+            models.Order.paid_amount,
+            paid.label("payments_total"),
+        )
+        .where(_totals_differ(items, paid))
+        .order_by(models.Order.order_id)
+    )
+    return stmt.limit(limit) if limit else stmt
+
+def order_totals_update(start: Optional[int] = None, end: Optional[int] = None):
+    # Recompute the totals of orders [start, end) that are off.
+    items, paid = _expected_totals()
+    stmt = update(models.Order).where(_totals_differ(items, paid))
+    if start is not None:
+        stmt = stmt.where(models.Order.order_id >= start)
+    if end is not None:
+        stmt = stmt.where(models.Order.order_id < end)
+    return stmt.values(total_amount=items, paid_amount=paid).execution_options(synchronize_session=False)
+
+def check_order_totals(db: Session, limit: int = 100) -> list:
+    return db.execute(order_totals_mismatch_query(limit)).all()
+
+def repair_order_totals(db: Session, batch_size: int = 5000) -> int:
+    # One order_id range per transaction, so a repair on a live database
+    # never holds locks on more than `batch_size` orders at a time.
+    last = db.query(func.max(models.Order.order_id)).scalar() or 0
+    fixed = 0
+    for start in range(1, last + 1, batch_size):
+        fixed += db.execute(order_totals_update(start, start + batch_size)).rowcount
+        db.commit()
+    if fixed:
+        versions.bump(db, "orders")
+        db.commit()
+    return fixed
+
+
+# ---------- Reads ----------
+
+def revenue_series_query(start: date, end: date):
+    return select(
+        models.DailyRevenue.day, models.DailyRevenue.method, models.DailyRevenue.amount
+    ).where(models.DailyRevenue.day >= start, models.DailyRevenue.day <= end)
+
+def fill_revenue_series(rows, start: date, days: int) -> List[dict]:
+    series = {
+        start + timedelta(days=i): {"amount": Decimal(0), "by_method": {m: Decimal(0) for m in models.PAYMENT_METHODS}}
+        for i in range(days)
+    }
+    for day, method, amount in rows:
+        series[day]["amount"] += amount
+        series[day]["by_method"][method] += amount
+
+    return [{"date": str(day), **values} for day, values in series.items()]
+
+def series_bounds(days: int, end: Optional[date] = None):
+    end = end or date.today()
+    return end - timedelta(days=days - 1), end
+
+def revenue_series(db: Session, days: int = 7, end: Optional[date] = None) -> List[dict]:
+    # The last `days` calendar days ending at `end` (default today), oldest
+    # first, with zero-revenue days filled in.
+    start, end = series_bounds(days, end)
+    rows = db.execute(revenue_series_query(start, end)).all()
+    return fill_revenue_series(rows, start, days)
+
+
+if __name__ == "__main__":
+    # python rollups.py rebuild          recompute daily_revenue
+    # python rollups.py check-totals     list orders whose totals are off (exit 1 if any)
+    # python rollups.py repair-totals    recompute those totals
+    from database import SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) == 2 else ""
+    if command not in ("rebuild", "check-totals", "repair-totals"):
+        sys.exit("usage: python rollups.py rebuild|check-totals|repair-totals")
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            print(f"daily_revenue rebuilt: {rebuild_daily_revenue(db)} rows")
+        elif command == "check-totals":
+            rows = check_order_totals(db)
+            for row in rows:
+                print(f"order {row.order_id}: total {row.total_amount} (items {row.items_total}), "
+                      f"paid {row.paid_amount} (payments {row.payments_total})")
+            print(f"{len(rows)} order(s) with wrong totals" + (" (first 100)" if len(rows) == 100 else ""))
+            sys.exit(1 if rows else 0)
+        else:
+            print(f"order totals repaired: {repair_order_totals(db)} orders")
+    finally:
+        db.close()
@@ -1,6 +1,46 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
+
+# ---------- List filters ----------
+# Used as `Depends()` so every field becomes an optional query parameter.
+
+class CustomerFilter(BaseModel):
+    q: Optional[str] = None
+
+class OrderFilter(BaseModel):
+    status_id: Optional[int] = None
+    customer_id: Optional[int] = None
+    dropoff_from: Optional[datetime] = None
+    dropoff_to: Optional[datetime] = None
+    pickup_from: Optional[datetime] = None
+    pickup_to: Optional[datetime] = None
+    # true: orders with something left to pay; false: settled ones
+    unpaid: Optional[bool] = None
+    # customer name / phone (search.py)
+    q: Optional[str] = None
+    # substring of the order notes: no index can serve it, so it scans the
+    # orders the other filters leave
+    notes: Optional[str] = None
+
+class OrderItemFilter(BaseModel):
+    order_id: Optional[int] = None
+    service_id: Optional[int] = None
+
+class PaymentFilter(BaseModel):
+    order_id: Optional[int] = None
+    method: Optional[str] = None
+    pay_from: Optional[datetime] = None
+    pay_to: Optional[datetime] = None
+
+# ---------- Branches ----------
+
+class Branch(BaseModel):
+    branch_id: int
+    branch_name: str
+
+    class Config:
+        orm_mode = True
 
 # ---------- Customers ----------
 
@@ -105,14 +145,63 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     pass
 
+class OrderItemNested(BaseModel):
+    service_id: int
+    item_desc: Optional[str] = None
+    qty: float
+    unit_price: float
+
+class PaymentNested(BaseModel):
+    pay_datetime: datetime
+    method: Literal["cash", "qr", "transfer", "card"]
+    amount: float
+    remark: Optional[str] = None
+
+class OrderCreateFull(OrderBase):
+    items: List[OrderItemNested] = []
+    payments: List[PaymentNested] = []
+
 class OrderUpdate(BaseModel):
     status_id: Optional[int] = None
     pickup_due_datetime: Optional[datetime] = None
     notes: Optional[str] = None
 
+class OrderStatusUpdate(BaseModel):
+    status_id: int
+    # the status the client saw; the change is refused (409) if it moved since
+    expected_status_id: Optional[int] = None
+
+# one washer / dryer load: every order gets the same target status
+class OrderStatusBulkUpdate(BaseModel):
+    order_ids: List[int]
+    status_id: int
+
+class OrderStatusBulkItem(BaseModel):
+    order_id: int
+    result: Literal["moved", "invalid_transition", "not_found"]
+    from_status_id: Optional[int] = None
+
+class OrderStatusBulkResult(BaseModel):
+    status_id: int
+    moved: int
+    results: List[OrderStatusBulkItem]
+
+class OrderStatusHistory(BaseModel):
+    history_id: int
+    order_id: int
+    from_status_id: Optional[int] = None
+    to_status_id: int
+    changed_at: datetime
+
+    class Config:
+        orm_mode = True
+
 class Order(OrderBase):
     order_id: int
     created_at: datetime
+    total_amount: float = 0
+    paid_amount: float = 0
+    balance: Optional[float] = None
     customer: Customer
     status: Status
     items: List[OrderItem] = []
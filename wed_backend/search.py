@@ -0,0 +1,143 @@
+# search.py
+import re
+import sys
+import unicodedata
+from typing import List, Optional, Set
+
+from sqlalchemy import case, func, insert, select, union
+from sqlalchemy.orm import Session
+
+import models
+
+# ---------- Customer search ----------
+# Customers carry two normalized keys: `phone_digits` (digits only, searched
+# by prefix) and `name_key` (NFKC, casefolded, whitespace removed). name_key
+# is split into trigrams stored in customer_search_grams, so a substring
+# query becomes an index lookup per gram instead of a LIKE '%q%' table scan.
+# Queries shorter than a trigram fall back to a name_key prefix range.
+
+GRAM_SIZE = 3
+MIN_PHONE_DIGITS = 3
+
+def normalize_name(value: Optional[str]) -> str:
+    value = unicodedata.normalize("NFKC", value or "").casefold()
+    return re.sub(r"\s+", "", value)
+
+def phone_digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+def name_grams(key: str) -> Set[str]:
+    return {key[i:i + GRAM_SIZE] for i in range(len(key) - GRAM_SIZE + 1)}
+
+def prefix_range(column, prefix: str):
+    # `col LIKE 'p%'` written as a range so it can use the index regardless
+    # of the database's LIKE collation rules
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper)
+
+
+# ---------- Maintenance ----------
+
+def index_customer(db: Session, customer: models.Customer):
+    customer.phone_digits = phone_digits(customer.phone) or None
+    customer.name_key = normalize_name(customer.full_name)
+    customer.search_grams = [
+        # branch_id None for a new customer: stamped with it at flush
+        models.CustomerSearchGram(gram=gram, branch_id=customer.branch_id)
+        for gram in sorted(name_grams(customer.name_key))
+    ]
+
+def reindex_customers(db: Session, batch_size: int = 1000) -> int:
+    # Backfill / repair for rows written before the search keys existed.
+    db.execute(models.CustomerSearchGram.__table__.delete())
+    last_id, total = 0, 0
+    while True:
+        rows = (
+            db.query(models.Customer.customer_id, models.Customer.branch_id,
+                     models.Customer.full_name, models.Customer.phone)
+            .filter(models.Customer.customer_id > last_id)
+            .order_by(models.Customer.customer_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        grams = []
+        for customer_id, branch_id, full_name, phone in rows:
+            key = normalize_name(full_name)
+            db.query(models.Customer).filter(models.Customer.customer_id == customer_id).update(
+                {"phone_digits": phone_digits(phone) or None, "name_key": key},
+                synchronize_session=False,
+            )
+            grams.extend(
+                {"gram": g, "customer_id": customer_id, "branch_id": branch_id} for g in name_grams(key)
+            )
+        if grams:
+            db.execute(insert(models.CustomerSearchGram.__table__), grams)
+        db.commit()
+        last_id, total = rows[-1][0], total + len(rows)
+    return total
+
+
+# ---------- Queries ----------
+
+def matching_ids_query(q: str):
+    # customer_ids matching `q` by phone prefix or by name substring
+    digits = phone_digits(q)
+    key = normalize_name(q)
+    conditions = []
+
+    if len(digits) >= MIN_PHONE_DIGITS:
+        conditions.append(prefix_range(models.Customer.phone_digits, digits))
+
+    grams = name_grams(key)
+    if grams:
+        gram_ids = (
+            select(models.CustomerSearchGram.customer_id)
+            .where(models.CustomerSearchGram.gram.in_(grams))
+            .group_by(models.CustomerSearchGram.customer_id)
+            .having(func.count() == len(grams))
+        )
+        conditions.append(models.Customer.customer_id.in_(gram_ids))
+    elif key:
+        conditions.append(prefix_range(models.Customer.name_key, key))
+
+    if not conditions:
+        return select(models.Customer.customer_id).where(False)
+    # one SELECT per way of matching rather than an OR: each gets the
+    # branch condition (branches.py) next to its own, so each can use its
+    # branch-led index
+    selects = [select(models.Customer.customer_id).where(c) for c in conditions]
+    return selects[0] if len(selects) == 1 else union(*selects)
+
+def search_customers(db: Session, q: str, limit: int = 20) -> List[models.Customer]:
+    # Ranked: phone prefix hits, then names starting with the query, then
+    # other name matches; shorter names first within each group.
+    digits = phone_digits(q)
+    key = normalize_name(q)
+    rank = []
+    if len(digits) >= MIN_PHONE_DIGITS:
+        rank.append(case((prefix_range(models.Customer.phone_digits, digits), 0), else_=1))
+    if key:
+        rank.append(case((prefix_range(models.Customer.name_key, key), 0), else_=1))
+
+    return (
+        db.query(models.Customer)
+        .filter(models.Customer.customer_id.in_(matching_ids_query(q)))
+        .order_by(*rank, func.length(models.Customer.name_key), models.Customer.customer_id)
+        .limit(limit)
+        .all()
+    )
+
+
+if __name__ == "__main__":
+    # python search.py reindex
+    from database import SessionLocal
+
+    if sys.argv[1:] != ["reindex"]:
+        sys.exit("usage: python search.py reindex")
+    db = SessionLocal()
+    try:
+        print(f"customer search keys rebuilt: {reindex_customers(db)} customers")
+    finally:
+        db.close()
@@ -0,0 +1,268 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.orm import Session
+
+import archive, branches, models, schemas, rollups, workflow
+from crud import order_rows_query, order_rows_select
+from projection import OrderProjection, shape_orders
+
+# Each stat is a select() builder plus a thin sync runner, so crud_async can
+# execute the very same statements on an AsyncSession.
+
+# ---------- Orders ----------
+
+# (status_id, status_name, order count) for every row in `statuses`, computed
+# in a single GROUP BY. Statuses without orders count as 0.
+def status_counts_query():
+    return (
+        select(
+            models.Status.status_id,
+            models.Status.status_name,
+            func.count(models.Order.order_id),
+        )
+        .outerjoin(models.Order, models.Order.status_id == models.Status.status_id)
+        .group_by(models.Status.status_id, models.Status.status_name)
+        .order_by(models.Status.status_id)
+    )
+
+def status_counts(db: Session) -> List[Tuple[int, str, int]]:
+    return db.execute(status_counts_query()).all()
+
+
+# ---------- Revenue ----------
+
+# (all-time revenue, revenue for `today`) in one pass over the daily_revenue
+# rollup, so the cost grows with the number of days, not payments.
+def revenue_totals_query(today: Optional[date] = None):
+    is_today = models.DailyRevenue.day == (today or date.today())
+    return select(
+        func.sum(models.DailyRevenue.amount),
+        func.sum(case((is_today, models.DailyRevenue.amount), else_=0)),
+    )
+
+def revenue_totals(db: Session, today: Optional[date] = None) -> Tuple[Decimal, Decimal]:
+    total, today_total = db.execute(revenue_totals_query(today)).one()
+    return total or 0, today_total or 0
+
+
+# ---------- Summary ----------
+
+def build_summary(counts, revenue) -> dict:
+    total_revenue, today_revenue = revenue
+    result = {
+        "total_orders": sum(c for _, _, c in counts),
+        "total_revenue": total_revenue or 0,
+        "today_revenue": today_revenue or 0,
+    }
+    # One flat key per status name (pending, washing, ...) for the dashboard
+    # cards, plus the ordered breakdown for anything that wants to iterate.
+    for _, name, count in counts:
+        result[name] = count
+    result["by_status"] = [
+        {"status_id": sid, "status": name, "count": count}
+        for sid, name, count in counts
+    ]
+    return result
+
+def summary(db: Session) -> dict:
+    return build_summary(status_counts(db), revenue_totals(db))
+
+
+# ---------- Dashboard ----------
+# Everything the dashboard page shows in five bounded queries: status counts,
+# revenue totals and the 7-day series (both over daily_revenue), the newest
+# pending orders (ix_orders_branch_status_order) and today's pickups still
+# to collect (ix_orders_branch_status_pickup). Order lists carry only the columns the
+# tables render and are capped, so the payload does not grow with the order
+# count.
+
+PENDING_STATUS_ID = 1
+REVENUE_DAYS = 7
+DASHBOARD_ORDER_FIELDS = "order_id,dropoff_datetime,pickup_due_datetime,customer.full_name,status.status_name"
+
+def dashboard_projection() -> OrderProjection:
+    return OrderProjection(fields=DASHBOARD_ORDER_FIELDS, expand=None)
+
+def pickups_query(projection: OrderProjection, day: date, limit: int):
+    start = datetime.combine(day, time.min)
+    return due_orders_query(projection, start, start + timedelta(days=1), limit)
+
+def dashboard_queries(pending_limit: int, pickup_limit: int, today: Optional[date] = None) -> dict:
+    today = today or date.today()
+    projection = dashboard_projection()
+    start, end = rollups.series_bounds(REVENUE_DAYS, today)
+    return {
+        "status_counts": status_counts_query(),
+        "revenue_totals": revenue_totals_query(today),
+        "revenue_series": rollups.revenue_series_query(start, end),
+        "pending_orders": order_rows_query(
+            projection, schemas.OrderFilter(status_id=PENDING_STATUS_ID), limit=pending_limit
+        ),
+        "pickups_today": pickups_query(projection, today, pickup_limit),
+    }
+
+def build_dashboard(results: dict, today: Optional[date] = None) -> dict:
+    # `results` holds the rows of each dashboard_queries() statement
+    projection = dashboard_projection()
+    start, _ = rollups.series_bounds(REVENUE_DAYS, today)
+    return {
+        "summary": build_summary(results["status_counts"], results["revenue_totals"][0]),
+        "revenue_7_days": rollups.fill_revenue_series(results["revenue_series"], start, REVENUE_DAYS),
+        "pending_orders": shape_orders(results["pending_orders"], projection, {}),
+        "pickups_today": shape_orders(results["pickups_today"], projection, {}),
+    }
+
+def dashboard(db: Session, pending_limit: int = 20, pickup_limit: int = 50, today: Optional[date] = None) -> dict:
+    today = today or date.today()
+    queries = dashboard_queries(pending_limit, pickup_limit, today)
+    return build_dashboard({name: db.execute(stmt).all() for name, stmt in queries.items()}, today)
+
+
+# ---------- Pickup queue ----------
+# Orders still to be collected, by when they are due:
+#
+#   overdue     due before now
+#   next_hour   due within the hour
+#   today       due later today
+#   tomorrow    due tomorrow
+#
+# Every query is a range on ix_orders_branch_status_pickup (one per open status),
+# so the cost follows what is due, not how many orders the shop has ever had.
+# Orders without a due time are never in the queue.
+
+OPEN_STATUS_IDS = sorted(s for s in workflow.TRANSITIONS if s != workflow.PICKED_UP)
+PICKUP_BUCKETS = ("overdue", "next_hour", "today", "tomorrow")
+PICKUP_QUEUE_FIELDS = "order_id,pickup_due_datetime,balance,customer.full_name,customer.phone,status.status_name"
+
+def pickup_windows(now: datetime) -> dict:
+    # bucket -> (start, end); start None means open-ended
+    hour = now + timedelta(hours=1)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time.min)
+    day_after = tomorrow + timedelta(days=1)
+    return {
+        "overdue": (None, now),
+        "next_hour": (now, hour),
+        "today": (min(hour, tomorrow), tomorrow),
+        "tomorrow": (max(hour, tomorrow), day_after),
+    }
+
+def _open_due(start: Optional[datetime], end: datetime):
+    conditions = [
+        models.Order.status_id.in_(OPEN_STATUS_IDS),
+        models.Order.pickup_due_datetime < end,
+    ]
+    if start is not None:
+        conditions.append(models.Order.pickup_due_datetime >= start)
+    return conditions
+
+def due_orders_query(projection: OrderProjection, start: Optional[datetime], end: datetime, limit: int):
+    # The first `limit` of each open status (a range already in due order),
+    # then the first `limit` of those. As one IN query, planners without
+    # statistics would rather walk ix_orders_branch_pickup_due for its
+    # order, past every picked-up order for "overdue".
+    due = models.Order.pickup_due_datetime
+    per_status = [
+        select(models.Order.order_id, due)
+        .where(models.Order.status_id == status_id, *_open_due(start, end)[1:])
+        .order_by(due, models.Order.order_id)
+        .limit(limit)
+        .subquery()
+        for status_id in OPEN_STATUS_IDS
+    ]
+    merged = union_all(*(select(s) for s in per_status)).subquery()
+    first = (
+        select(merged)
+        .order_by(merged.c.pickup_due_datetime, merged.c.order_id)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        order_rows_select(projection)
+        .join(first, first.c.order_id == models.Order.order_id)
+        .order_by(first.c.pickup_due_datetime, first.c.order_id)
+    )
+
+def pickup_counts_query(windows: dict):
+    # one pass over the whole window, counted per bucket
+    due = models.Order.pickup_due_datetime
+    counts = []
+    for name, (start, end) in windows.items():
+        in_window = due < end if start is None else (due >= start) & (due < end)
+        counts.append(func.count(case((in_window, 1))).label(name))
+    return select(*counts).where(*_open_due(None, windows["tomorrow"][1]))
+
+def pickup_queue_queries(limit: int, now: Optional[datetime] = None) -> dict:
+    windows = pickup_windows(now or datetime.now())
+    projection = OrderProjection(fields=PICKUP_QUEUE_FIELDS, expand=None)
+    queries = {"counts": pickup_counts_query(windows)}
+    for name, (start, end) in windows.items():
+        queries[name] = due_orders_query(projection, start, end, limit)
+    return queries
+
+def build_pickup_queue(results: dict, now: datetime) -> dict:
+    projection = OrderProjection(fields=PICKUP_QUEUE_FIELDS, expand=None)
+    return {
+        "now": now,
+        "counts": dict(results["counts"][0]._mapping),
+        "buckets": {name: shape_orders(results[name], projection, {}) for name in PICKUP_BUCKETS},
+    }
+
+def pickup_queue(db: Session, limit: int = 50, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now()
+    queries = pickup_queue_queries(limit, now)
+    return build_pickup_queue({name: db.execute(stmt).all() for name, stmt in queries.items()}, now)
+
+
+# ---------- Turnaround ----------
+# Hours orders spend in each status, from consecutive order_status_history
+# rows of the same order changed in the last `days` days. A stay is counted
+# once the order has left the status; the window is an index range on
+# changed_at, so the cost follows recent activity, not history size.
+
+def status_history_query(since: datetime, branch_id: Optional[int] = None):
+    # archived orders included: a window can reach back past the archive age.
+    # Plain tables, so the branch is filtered here (ix_status_history_branch_changed).
+    def build(tables):
+        history = tables["order_status_history"]
+        stmt = (
+            select(history.c.order_id, history.c.to_status_id, history.c.changed_at, history.c.history_id)
+            .where(history.c.changed_at >= since)
+        )
+        return stmt if branch_id is None else stmt.where(history.c.branch_id == branch_id)
+    return archive.ordered(archive.union_sides(build), "order_id", "changed_at", "history_id")
+
+def _quantile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def build_turnaround(rows, statuses) -> List[dict]:
+    hours = defaultdict(list)
+    previous = None
+    for order_id, status_id, changed_at, _ in rows:
+        if previous and previous[0] == order_id:
+            hours[previous[1]].append((changed_at - previous[2]).total_seconds() / 3600)
+        previous = (order_id, status_id, changed_at)
+
+    result = []
+    for status_id, name in statuses:
+        stays = sorted(hours.get(status_id, []))
+        result.append({
+            "status_id": status_id,
+            "status": name,
+            "orders": len(stays),
+            "avg_hours": round(sum(stays) / len(stays), 2) if stays else None,
+            "p50_hours": round(_quantile(stays, 0.5), 2) if stays else None,
+            "p90_hours": round(_quantile(stays, 0.9), 2) if stays else None,
+        })
+    return result
+
+def statuses_query():
+    return select(models.Status.status_id, models.Status.status_name).order_by(models.Status.status_id)
+
+def turnaround(db: Session, days: int = 30) -> List[dict]:
+    since = datetime.now() - timedelta(days=days)
+    rows = db.execute(status_history_query(since, branches.scope(db))).all()
+    return build_turnaround(rows, db.execute(statuses_query()).all())
@@ -0,0 +1,90 @@
+# Tests run against a throwaway SQLite file, migrated like a deploy would
+# (python migrations.py upgrade). The app reads its settings at import, so
+# they are set before anything from wed_backend is imported.
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="laundry-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'laundry.db')}"
+os.environ.pop("DB_PROFILE", None)
+os.environ.pop("DB_REPLICA_URLS", None)
+os.environ.pop("BRANCH_SHARDS", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select, func
+
+import database, main, migrations, models
+
+STATUSES = ["pending", "washing", "drying", "ironing", "ready", "picked_up"]
+
+
+@pytest.fixture(scope="session")
+def engine():
+    migrations.upgrade(database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.Status), [
+            {"status_id": i, "status_name": name} for i, name in enumerate(STATUSES, 1)
+        ])
+        conn.execute(insert(models.Service), [
+            {"service_id": 1, "service_name": "wash", "base_price": 40, "unit": "kg"},
+        ])
+    return database.engine
+
+
+@pytest.fixture(scope="session")
+def client(engine):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def add_orders(engine):
+    # n orders in `status_id` for one new customer, each with `items` items
+    # and one payment; returns their ids
+    def add(n: int, status_id: int = 1, items: int = 1):
+        now = datetime.now()
+        with engine.begin() as conn:
+            customer_id = conn.execute(
+                insert(models.Customer).values(full_name="Test Customer", created_at=now)
+            ).inserted_primary_key[0]
+            first = (conn.execute(select(func.max(models.Order.order_id))).scalar() or 0) + 1
+            order_ids = list(range(first, first + n))
+            conn.execute(insert(models.Order), [{
+                "order_id": order_id, "customer_id": customer_id, "status_id": status_id,
+                "dropoff_datetime": now - timedelta(days=1), "pickup_due_datetime": now + timedelta(days=1),
+                "created_at": now, "total_amount": 40 * items, "paid_amount": 40,
+            } for order_id in order_ids])
+            conn.execute(insert(models.OrderItem), [
+                {"order_id": order_id, "service_id": 1, "item_desc": "wash", "qty": 1, "unit_price": 40}
+                for order_id in order_ids for _ in range(items)
+            ])
+            conn.execute(insert(models.Payment), [
+                {"order_id": order_id, "pay_datetime": now, "method": "cash", "amount": 40}
+                for order_id in order_ids
+            ])
+        return order_ids
+    return add
+
+
+@contextmanager
+def _counting(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def count_queries(engine):
+    # with count_queries() as statements: ... -> every SQL statement sent
+    return lambda: _counting(engine)
@@ -0,0 +1,17 @@
+# Every route that takes a branch refuses one that does not exist, including
+# the streaming ones that open their own sessions.
+import pytest
+
+
+@pytest.mark.parametrize("url", ["/orders", "/export/orders", "/export/payments", "/events"])
+def test_unknown_branch_is_404(client, url):
+    response = client.get(url, headers={"X-Branch-Id": "999"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown branch 999"
+
+
+def test_export_of_a_known_branch(client, add_orders):
+    order_ids = add_orders(2)
+    response = client.get("/export/orders?format=ndjson", headers={"X-Branch-Id": "1"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) >= len(order_ids)
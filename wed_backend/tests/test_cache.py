@@ -0,0 +1,57 @@
+# cache.ReferenceCache under concurrent misses.
+import threading
+import time
+
+from cache import ReferenceCache
+
+
+def test_one_load_per_key_and_other_keys_not_held_up():
+    cache = ReferenceCache()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_loader():
+        loads.append("slow")
+        started.set()
+        release.wait(5)
+        return b"slow"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=("slow", slow_loader)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+
+    # another key loads and hits while "slow" is still loading
+    begin = time.monotonic()
+    assert cache.get_or_load("fast", lambda: b"fast") == b"fast"
+    assert cache.get_or_load("fast", lambda: b"other") == b"fast"
+    assert time.monotonic() - begin < 1
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert loads == ["slow"]
+    assert cache.get_or_load("slow", lambda: b"again") == b"slow"
+
+
+def test_load_started_before_invalidate_is_not_stored():
+    cache = ReferenceCache()
+
+    def loader():
+        cache.invalidate("key")
+        return b"stale"
+
+    assert cache.get_or_load("key", loader) == b"stale"
+    assert cache.get_or_load("key", lambda: b"fresh") == b"fresh"
+
+
+def test_url_forms_share_an_entry(client):
+    # the same rows asked for with another query string or branch form: the
+    # ETags differ, the cached body is the same
+    client.get("/services")
+    hits = client.get("/cache/stats").json()["hits"]
+    first = client.get("/services?form=1")
+    second = client.get("/services?form=2", headers={"X-Branch-Id": "1"})
+    assert first.headers["etag"] != second.headers["etag"]
+    assert first.content == second.content
+    assert client.get("/cache/stats").json()["hits"] == hits + 2
@@ -0,0 +1,63 @@
+# /metrics, read back the way Prometheus scrapes it.
+import re
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+import branches, database, metrics
+
+
+def _sample(client, line_prefix: str) -> float:
+    text = client.get("/metrics").text
+    match = re.search(rf"^{re.escape(line_prefix)} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_serialize_time_leaves_out_dependencies(client, add_orders, monkeypatch):
+    add_orders(5, status_id=4)
+    route = 'method="GET",route="/orders/status/{status_id}"'
+    before = _sample(client, f"laundry_serialize_duration_seconds_sum{{{route}}}")
+    count = _sample(client, f"laundry_serialize_duration_seconds_count{{{route}}}")
+
+    check_known = branches.check_known
+
+    def slow_check_known(db, branch_id):
+        time.sleep(0.2)
+        return check_known(db, branch_id)
+
+    monkeypatch.setattr(branches, "check_known", slow_check_known)
+    assert client.get("/orders/status/4").status_code == 200
+
+    assert _sample(client, f"laundry_serialize_duration_seconds_count{{{route}}}") == count + 1
+    assert 0 < _sample(client, f"laundry_serialize_duration_seconds_sum{{{route}}}") - before < 0.2
+
+
+def test_pool_gauges_are_labelled_by_engine(client, tmp_path):
+    # a second pooled engine, as a replica or shard would add
+    extra = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    metrics.instrument_engine(extra)
+    try:
+        text = client.get("/metrics").text
+    finally:
+        metrics._engines.remove(extra)
+
+    sizes = [line for line in text.splitlines() if line.startswith("laundry_db_pool_size")]
+    for engine in (database.engine, extra):
+        url = engine.url.render_as_string(hide_password=True)
+        assert any(f'engine="{url}"' in line for line in sizes)
+    assert text.count("# TYPE laundry_db_pool_size gauge") == 1
+    assert "laundry_db_pool_1_" not in text
+
+
+def test_failed_statement_leaves_no_start_time(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'failing.db'}")
+    metrics.instrument_engine(engine)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+            assert conn.info["query_start"] == []
+    finally:
+        metrics._engines.remove(engine)
@@ -0,0 +1,43 @@
+# The order endpoints load customer, status, items and payments up front
+# (crud.ORDER_LOADERS, projection.py), so the number of statements a request
+# sends must not grow with the number of orders, items or payments.
+import pytest
+
+from pagination import MAX_PAGE_SIZE
+
+
+def _count(client, count_queries, url):
+    client.get(url)  # warm the reference cache and the connection pool
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements), response
+
+
+@pytest.mark.parametrize("url, status_id", [
+    ("/orders/status/2?limit={limit}", 2),
+    ("/orders?status_id=3&limit={limit}", 3),
+])
+def test_order_lists_cost_a_fixed_number_of_queries(client, count_queries, add_orders, url, status_id):
+    url = url.format(limit=MAX_PAGE_SIZE)
+
+    add_orders(3, status_id=status_id)
+    few, response = _count(client, count_queries, url)
+    assert len(response.json()) == 3
+
+    # more than one full page, and more than selectinload's 500 ids per IN
+    add_orders(MAX_PAGE_SIZE + 100, status_id=status_id, items=2)
+    many, response = _count(client, count_queries, url)
+    assert len(response.json()) == MAX_PAGE_SIZE
+    assert response.headers["X-Next-Cursor"]
+
+    assert many == few
+
+
+def test_order_detail_costs_a_fixed_number_of_queries(client, count_queries, add_orders):
+    [small] = add_orders(1, items=1)
+    [large] = add_orders(1, items=50)
+    few, _ = _count(client, count_queries, f"/orders/{small}")
+    many, response = _count(client, count_queries, f"/orders/{large}")
+    assert len(response.json()["items"]) == 50
+    assert many == few
@@ -0,0 +1,127 @@
+# Runs EXPLAIN on the hot queries and checks each one is served by the index
+# it was designed for, so a schema or query change that drops one to a scan
+# fails here. explain() reads MySQL's plan format too.
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import archive, branches, models, search, stats
+from crud import filter_orders, order_children_query
+from pagination import keyset
+from projection import OrderProjection
+import schemas
+
+def hot_queries():
+    now = datetime.now()
+    return [
+        (
+            "orders by status (keyset page)",
+            keyset(select(models.Order).where(models.Order.status_id == 1), models.Order.order_id, 10_000, 100),
+            "ix_orders_branch_status_order",
+        ),
+        (
+            "orders due for pickup",
+            select(models.Order).where(
+                models.Order.status_id == 5,
+                models.Order.pickup_due_datetime < now + timedelta(days=1),
+            ),
+            "ix_orders_branch_status_pickup",
+        ),
+        (
+            "pickup queue bucket",
+            stats.due_orders_query(OrderProjection(stats.PICKUP_QUEUE_FIELDS, None), now, now + timedelta(hours=1), 50),
+            "ix_orders_branch_status_pickup",
+        ),
+        (
+            "pickup queue counts",
+            stats.pickup_counts_query(stats.pickup_windows(now)),
+            "ix_orders_branch_status_pickup",
+        ),
+        (
+            "orders by customer",
+            keyset(filter_orders(select(models.Order), schemas.OrderFilter(customer_id=1)), models.Order.order_id, None, 100),
+            "ix_orders_customer_branch_order",
+        ),
+        (
+            "orders by pickup date range",
+            filter_orders(select(models.Order), schemas.OrderFilter(pickup_from=now, pickup_to=now + timedelta(days=1))),
+            "ix_orders_branch_pickup_due",
+        ),
+        (
+            "orders by dropoff date range",
+            filter_orders(select(models.Order), schemas.OrderFilter(dropoff_from=now, dropoff_to=now + timedelta(days=1))),
+            "ix_orders_branch_dropoff",
+        ),
+        (
+            "unpaid orders (keyset page)",
+            keyset(filter_orders(select(models.Order), schemas.OrderFilter(unpaid=True)), models.Order.order_id, 10_000, 100),
+            "ix_orders_branch_unpaid_order",
+        ),
+        (
+            "items of a page of orders",
+            order_children_query(OrderProjection(None, None), "items", list(range(1, 101))),
+            "ix_order_items_order_branch",
+        ),
+        (
+            "payments of a page of orders",
+            order_children_query(OrderProjection(None, None), "payments", list(range(1, 101))),
+            "ix_payments_order_branch",
+        ),
+        (
+            "payments by date range",
+            select(models.Payment).where(models.Payment.pay_datetime >= now, models.Payment.pay_datetime < now + timedelta(days=1)),
+            "ix_payments_branch_pay_datetime",
+        ),
+        (
+            "status counts",
+            stats.status_counts_query(),
+            ("ix_orders_branch_status_order", "ix_orders_branch_status_pickup"),
+        ),
+        (
+            "archive candidates",
+            archive.candidates_query(now - timedelta(days=180), archive.BATCH_SIZE),
+            # the primary key walk: "INTEGER PRIMARY KEY" / key=PRIMARY
+            "PRIMARY",
+        ),
+        (
+            "status history of an order (hot + archived)",
+            archive.status_history_query(1, branches.DEFAULT_BRANCH_ID),
+            "ix_status_history_archive_order_branch",
+        ),
+        (
+            "customer search by phone prefix",
+            select(models.Customer.customer_id).where(
+                models.Customer.customer_id.in_(search.matching_ids_query("0812"))
+            ),
+            "ix_customers_branch_phone",
+        ),
+        (
+            "customer search by name grams",
+            select(models.Customer.customer_id).where(
+                models.Customer.customer_id.in_(search.matching_ids_query("somchai"))
+            ),
+            "ix_customer_search_grams_branch_gram",
+        ),
+    ]
+
+# maintenance queries, run on every branch at once
+ALL_BRANCHES = {"archive candidates"}
+
+def explain(conn, stmt) -> str:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+        return "\n".join(str(row[-1]) for row in rows)
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}").mappings().all()
+    return "\n".join(f"{row['table']}: key={row['key']} type={row['type']}" for row in rows)
+
+@pytest.mark.parametrize("name, stmt, index", hot_queries(), ids=[q[0] for q in hot_queries()])
+def test_hot_query_uses_its_index(engine, name, stmt, index):
+    if name not in ALL_BRANCHES:
+        # the criteria a request's session adds (branches.py)
+        stmt = stmt.options(branches.criteria(branches.DEFAULT_BRANCH_ID))
+    with engine.connect() as conn:
+        plan = explain(conn, stmt)
+    indexes = index if isinstance(index, tuple) else (index,)
+    assert any(i in plan for i in indexes), f"expected {' or '.join(indexes)}, got:\n{plan}"
@@ -0,0 +1,17 @@
+# workflow.py: the statuses an order may take, from creation on.
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/orders", "/orders/full"])
+def test_new_order_starts_pending(client, path):
+    customer_id = client.post("/customers", json={"full_name": "Workflow Customer"}).json()["customer_id"]
+    order = {"customer_id": customer_id, "dropoff_datetime": "2026-10-18T09:00:00"}
+
+    refused = client.post(path, json={**order, "status_id": 5})
+    assert refused.status_code == 422
+    assert refused.json()["allowed"] == [1]
+
+    created = client.post(path, json={**order, "status_id": 1})
+    assert created.status_code == 200
+    history = client.get(f"/orders/{created.json()['order_id']}/history").json()
+    assert [(h["from_status_id"], h["to_status_id"]) for h in history] == [(None, 1)]
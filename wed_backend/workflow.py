@@ -0,0 +1,170 @@
+# workflow.py
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+import branches, models
+
+# ---------- Order status state machine ----------
+# Status ids as seeded in `statuses`. An order moves forward through the
+# shop; ironing is optional, and a ready order can go back to washing when a
+# customer sends it back. Picked up is final.
+
+PENDING, WASHING, DRYING, IRONING, READY, PICKED_UP = 1, 2, 3, 4, 5, 6
+
+TRANSITIONS: Dict[int, Set[int]] = {
+    PENDING: {WASHING},
+    WASHING: {DRYING},
+    DRYING: {IRONING, READY},
+    IRONING: {READY},
+    READY: {PICKED_UP, WASHING},
+    PICKED_UP: set(),
+}
+
+# where a new order can start
+INITIAL: Set[int] = {PENDING}
+
+class InvalidTransition(ValueError):
+    # from_status_id is None for a new order
+    def __init__(self, from_status_id: Optional[int], to_status_id: int):
+        if from_status_id is None:
+            message = f"A new order cannot start in status {to_status_id}"
+        else:
+            message = f"Cannot move an order from status {from_status_id} to {to_status_id}"
+        super().__init__(message)
+        self.from_status_id = from_status_id
+        self.to_status_id = to_status_id
+
+class StatusConflict(Exception):
+    # the order's status is no longer the one the change was based on
+    # (current_status_id is None for a batch: some order left that status)
+    def __init__(self, expected_status_id: int, current_status_id: Optional[int]):
+        if current_status_id is None:
+            message = f"An order left status {expected_status_id} while the batch was applied"
+        else:
+            message = f"Order status is {current_status_id}, expected {expected_status_id}"
+        super().__init__(message)
+        self.expected_status_id = expected_status_id
+        self.current_status_id = current_status_id
+
+def allowed(from_status_id: Optional[int]) -> Set[int]:
+    # None: a new order
+    return INITIAL if from_status_id is None else TRANSITIONS.get(from_status_id, set())
+
+def check_transition(from_status_id: Optional[int], to_status_id: int):
+    if to_status_id not in allowed(from_status_id):
+        raise InvalidTransition(from_status_id, to_status_id)
+
+
+# ---------- Applying a change ----------
+# The UPDATE only matches while the order still has the status the change
+# was validated against, so two counters moving the same order cannot both
+# win: the second one matches no row and gets a StatusConflict. The history
+# row goes into the same transaction; the caller commits.
+
+def transition(
+    db: Session,
+    order_id: int,
+    to_status_id: int,
+    expected_status_id: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> Optional[int]:
+    # Returns the previous status id, or None if the order does not exist.
+    from_status_id = expected_status_id
+    if from_status_id is None:
+        from_status_id = current_status(db, order_id)
+        if from_status_id is None:
+            return None
+    check_transition(from_status_id, to_status_id)
+
+    result = db.execute(
+        update(models.Order)
+        .where(models.Order.order_id == order_id, models.Order.status_id == from_status_id)
+        .values(status_id=to_status_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        current = current_status(db, order_id)
+        if current is None:
+            return None
+        raise StatusConflict(from_status_id, current)
+
+    record(db, order_id, from_status_id, to_status_id, now)
+    return from_status_id
+
+def current_status(db: Session, order_id: int) -> Optional[int]:
+    return db.execute(
+        select(models.Order.status_id).where(models.Order.order_id == order_id)
+    ).scalar()
+
+def record(db: Session, order_id: int, from_status_id: Optional[int], to_status_id: int,
+           now: Optional[datetime] = None):
+    db.execute(insert(models.OrderStatusHistory).values(
+        branch_id=branches.current(db),
+        order_id=order_id,
+        from_status_id=from_status_id,
+        to_status_id=to_status_id,
+        changed_at=now or datetime.now(),
+    ))
+
+
+# ---------- Batches ----------
+# A machine load moves many orders at once. The orders are read (and, on
+# MySQL, row-locked) in one SELECT, checked against the graph, and the valid
+# ones moved with one UPDATE per source status, normally just one, plus one
+# multi-row history insert. Orders that are missing or cannot make the move
+# are reported back and left alone; the rest still move.
+
+MOVED, INVALID, NOT_FOUND = "moved", "invalid_transition", "not_found"
+
+def transition_many(
+    db: Session,
+    order_ids: List[int],
+    to_status_id: int,
+    now: Optional[datetime] = None,
+) -> List[dict]:
+    # Returns one {"order_id", "result", "from_status_id"} per distinct id,
+    # in request order. Raises StatusConflict if an order changed status
+    # between the SELECT and the UPDATE (only possible without row locks);
+    # the caller should roll back and retry the batch.
+    order_ids = list(dict.fromkeys(order_ids))
+    current = dict(db.execute(
+        select(models.Order.order_id, models.Order.status_id)
+        .where(models.Order.order_id.in_(order_ids))
+        .with_for_update()
+    ).all())
+
+    results = []
+    by_source: Dict[int, List[int]] = {}
+    for order_id in order_ids:
+        from_status_id = current.get(order_id)
+        if from_status_id is None:
+            result = NOT_FOUND
+        elif to_status_id in TRANSITIONS.get(from_status_id, ()):
+            result = MOVED
+            by_source.setdefault(from_status_id, []).append(order_id)
+        else:
+            result = INVALID
+        results.append({"order_id": order_id, "result": result, "from_status_id": from_status_id})
+
+    for from_status_id, ids in by_source.items():
+        matched = db.execute(
+            update(models.Order)
+            .where(models.Order.order_id.in_(ids), models.Order.status_id == from_status_id)
+            .values(status_id=to_status_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if matched != len(ids):
+            raise StatusConflict(from_status_id, None)
+
+    if by_source:
+        changed_at = now or datetime.now()
+        branch_id = branches.current(db)
+        db.execute(insert(models.OrderStatusHistory), [
+            {"branch_id": branch_id, "order_id": r["order_id"], "from_status_id": r["from_status_id"],
+             "to_status_id": to_status_id, "changed_at": changed_at}
+            for r in results if r["result"] == MOVED
+        ])
+    return results
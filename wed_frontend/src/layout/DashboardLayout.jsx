@@ -1,11 +1,35 @@
+import { useEffect, useState } from "react";
 import { NavLink, Outlet } from "react-router-dom";
+import { API } from "../services/api";
 
 export default function DashboardLayout() {
+  const [branches, setBranches] = useState([]);
+
+  useEffect(() => {
+    API.getBranches().then(setBranches).catch(() => setBranches([]));
+  }, []);
+
+  // every page holds data of the current branch: start over on a switch
+  function changeBranch(e) {
+    API.setBranchId(e.target.value);
+    window.location.reload();
+  }
+
   return (
     <div className="layout">
       <aside className="sidebar">
         <h1 className="sidebar-title">Laundry Admin</h1>
 
+        {branches.length > 1 && (
+          <select className="sidebar-branch" value={API.getBranchId()} onChange={changeBranch}>
+            {branches.map((b) => (
+              <option key={b.branch_id} value={b.branch_id}>
+                {b.branch_name}
+              </option>
+            ))}
+          </select>
+        )}
+
         <nav className="sidebar-nav">
           <NavLink
             to="/dashboard"
@@ -54,6 +78,15 @@ export default function DashboardLayout() {
           >
             New Order
           </NavLink>
+
+          <NavLink
+            to="/pickups"
+            className={({ isActive }) =>
+              "sidebar-link" + (isActive ? " active" : "")
+            }
+          >
+            Pickup Queue
+          </NavLink>
         </nav>
       </aside>
 
@@ -12,6 +12,7 @@ import AddCustomerPage from "./pages/AddCustomerPage";
 import OrdersPage from "./pages/OrdersPage";
 import AddOrderPage from "./pages/AddOrderPage";
 import OrderDetailsPage from "./pages/OrderDetailsPage";
+import PickupQueuePage from "./pages/PickupQueuePage";
 
 ReactDOM.createRoot(document.getElementById("root")).render(
   <React.StrictMode>
@@ -32,6 +33,7 @@ ReactDOM.createRoot(document.getElementById("root")).render(
           <Route path="/orders" element={<OrdersPage />} />
           <Route path="/orders/new" element={<AddOrderPage />} />
           <Route path="/orders/:id" element={<OrderDetailsPage />} />
+          <Route path="/pickups" element={<PickupQueuePage />} />
 
         </Route>
       </Routes>
@@ -6,6 +6,7 @@ export default function AddOrderPage() {
   const navigate = useNavigate();
 
   const [customers, setCustomers] = useState([]);
+  const [customerQuery, setCustomerQuery] = useState("");
   const [services, setServices] = useState([]);
 
   const [selectedCustomerId, setSelectedCustomerId] = useState(null);
@@ -15,12 +16,36 @@ export default function AddOrderPage() {
 
   const [items, setItems] = useState([{ service_id: "", qty: 1 }]);
 
-  // Load customers + services
+  // Load services
   useEffect(() => {
-    API.getCustomers().then(setCustomers);
     API.getServices().then(setServices);
   }, []);
 
+  // ค้นหาลูกค้าฝั่ง server (ชื่อ / เบอร์โทร), debounce 300ms
+  useEffect(() => {
+    const q = customerQuery.trim();
+    if (!q || selectedCustomerId) {
+      setCustomers([]);
+      return;
+    }
+    // a reply that comes back after the next keystroke / pick is dropped
+    let current = true;
+    const timer = setTimeout(() => {
+      API.searchCustomers(q)
+        .then((rows) => current && setCustomers(rows))
+        .catch(console.error);
+    }, 300);
+    return () => {
+      current = false;
+      clearTimeout(timer);
+    };
+  }, [customerQuery, selectedCustomerId]);
+
+  const pickCustomer = (c) => {
+    setSelectedCustomerId(c.customer_id);
+    setCustomerQuery(c.phone ? `${c.full_name} (${c.phone})` : c.full_name);
+  };
+
   const addItemRow = () => {
     setItems([...items, { service_id: "", qty: 1 }]);
   };
@@ -33,31 +58,31 @@ export default function AddOrderPage() {
     e.preventDefault();
 
     try {
-      // 1) Create order
-      const order = await API.addOrder({
+      // สร้าง order พร้อม items ในคำขอเดียว (transaction เดียว)
+      const orderItems = items
+        .map((item) => {
+          const service = services.find(
+            (s) => s.service_id === item.service_id
+          );
+          if (!service) return null;
+          return {
+            service_id: item.service_id,
+            item_desc: service.service_name,
+            qty: Number(item.qty),
+            unit_price: Number(service.base_price),
+          };
+        })
+        .filter(Boolean);
+
+      const order = await API.addOrderFull({
         customer_id: selectedCustomerId,
         status_id: 1, // pending
         dropoff_datetime,
         pickup_due_datetime,
         notes,
+        items: orderItems,
       });
 
-      // 2) Add items
-      for (const item of items) {
-        const service = services.find(
-          (s) => s.service_id === item.service_id
-        );
-        if (!service) continue;
-
-        await API.addOrderItem({
-          order_id: order.order_id,
-          service_id: item.service_id,
-          item_desc: service.service_name,
-          qty: Number(item.qty),
-          unit_price: Number(service.base_price),
-        });
-      }
-
       alert("Order created successfully!");
       navigate(`/orders/${order.order_id}`);
     } catch (err) {
@@ -97,21 +122,35 @@ export default function AddOrderPage() {
               <label className="form-label">
                 Customer <span style={{ color: "#f97316" }}>*</span>
               </label>
-              <select
-                value={selectedCustomerId || ""}
-                onChange={(e) =>
-                  setSelectedCustomerId(
-                    e.target.value ? Number(e.target.value) : null
-                  )
-                }
-              >
-                <option value="">-- select --</option>
-                {customers.map((c) => (
-                  <option key={c.customer_id} value={c.customer_id}>
-                    {c.full_name}
-                  </option>
-                ))}
-              </select>
+              <input
+                value={customerQuery}
+                onChange={(e) => {
+                  setCustomerQuery(e.target.value);
+                  setSelectedCustomerId(null);
+                }}
+                placeholder="Search name / phone..."
+              />
+              {customers.length > 0 && (
+                <div
+                  style={{
+                    marginTop: "6px",
+                    borderRadius: "10px",
+                    border: "1px solid #262631",
+                    background: "#111827",
+                  }}
+                >
+                  {customers.map((c) => (
+                    <div
+                      key={c.customer_id}
+                      onClick={() => pickCustomer(c)}
+                      style={{ padding: "8px 12px", cursor: "pointer", color: "#e5e7eb" }}
+                    >
+                      {c.full_name}{" "}
+                      <span style={{ color: "#9ca3af" }}>{c.phone}</span>
+                    </div>
+                  ))}
+                </div>
+              )}
             </div>
 
             {/* DATES 2 คอลัมน์ */}
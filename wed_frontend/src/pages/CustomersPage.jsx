@@ -5,19 +5,16 @@ export default function CustomersPage() {
   const [customers, setCustomers] = useState([]);
   const [search, setSearch] = useState("");
 
+  // ค้นหาฝั่ง server (ชื่อ / เบอร์โทร), debounce 300ms
   useEffect(() => {
-    API.getCustomers().then(setCustomers);
-  }, []);
-
-  // filter
-  const filtered = customers.filter((c) => {
-    const t = search.toLowerCase();
-    return (
-      c.full_name.toLowerCase().includes(t) ||
-      c.phone.includes(t) ||
-      c.address.toLowerCase().includes(t)
-    );
-  });
+    const timer = setTimeout(() => {
+      const request = search.trim()
+        ? API.searchCustomers(search.trim())
+        : API.getCustomers();
+      request.then(setCustomers).catch(console.error);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search]);
 
   return (
     <div style={{ padding: "20px" }}>
@@ -27,7 +24,7 @@ export default function CustomersPage() {
       <div style={{ marginBottom: "15px" }}>
         <input
           type="text"
-          placeholder="Search name / phone / address..."
+          placeholder="Search name / phone..."
           value={search}
           onChange={(e) => setSearch(e.target.value)}
           style={{
@@ -68,7 +65,7 @@ export default function CustomersPage() {
           </thead>
 
           <tbody>
-            {filtered.map((c) => (
+            {customers.map((c) => (
               <tr
                 key={c.customer_id}
                 style={{
@@ -95,7 +92,7 @@ export default function CustomersPage() {
               </tr>
             ))}
 
-            {filtered.length === 0 && (
+            {customers.length === 0 && (
               <tr>
                 <td colSpan="4" style={{ padding: 20, textAlign: "center" }}>
                   No customers found.
@@ -37,24 +37,65 @@ const chartCardStyle = {
 
 export default function DashboardPage() {
   const [summary, setSummary] = useState(null);
-  const [ordersByStatus, setOrdersByStatus] = useState([]);
   const [revenue7, setRevenue7] = useState([]);
-  const [orders, setOrders] = useState([]);
+  const [pendingOrders, setPendingOrders] = useState([]);
+  const [todayPickup, setTodayPickup] = useState([]);
 
   useEffect(() => {
-    API.getSummary().then(setSummary);
-    API.getOrdersByStatus().then(setOrdersByStatus);
-    API.getRevenue7Days().then(setRevenue7);
-    API.getOrders().then(setOrders);
+    // ทุกอย่างของหน้านี้มาจาก request เดียว
+    const loadAll = () => {
+      API.getDashboard().then((d) => {
+        setSummary(d.summary);
+        setRevenue7(d.revenue_7_days);
+        setPendingOrders(d.pending_orders);
+        setTodayPickup(d.pickups_today);
+      });
+    };
+    loadAll();
+
+    // อัปเดตแบบ live จาก server (ไม่ต้องโหลดใหม่ทั้งหมด)
+    return API.subscribeEvents({
+      order_status: (e) => {
+        setSummary((s) => s && moveStatusCount(s, e.from_status_id, e.status_id));
+        if (e.from_status_id === 1) {
+          setPendingOrders((list) => list.filter((o) => o.order_id !== e.order_id));
+        }
+      },
+      order_status_bulk: (e) => {
+        setSummary((s) =>
+          s && e.orders.reduce((acc, o) => moveStatusCount(acc, o.from_status_id, e.status_id), s)
+        );
+        const moved = new Set(e.orders.filter((o) => o.from_status_id === 1).map((o) => o.order_id));
+        setPendingOrders((list) => list.filter((o) => !moved.has(o.order_id)));
+      },
+      order_created: (e) => {
+        setSummary((s) =>
+          s && { ...moveStatusCount(s, null, e.status_id), total_orders: s.total_orders + 1 }
+        );
+      },
+      payment_created: (e) => {
+        const day = e.pay_datetime.slice(0, 10);
+        const isToday = day === new Date().toISOString().slice(0, 10);
+        setSummary((s) =>
+          s && {
+            ...s,
+            total_revenue: s.total_revenue + e.amount,
+            today_revenue: s.today_revenue + (isToday ? e.amount : 0),
+          }
+        );
+        setRevenue7((rows) =>
+          rows.map((r) => (r.date === day ? { ...r, amount: r.amount + e.amount } : r))
+        );
+      },
+      // server บอกว่าเราตามไม่ทัน → โหลดใหม่ทั้งหมดครั้งเดียว
+      resync: loadAll,
+    });
   }, []);
 
   if (!summary) return <h2>Loading dashboard...</h2>;
 
-  const pendingOrders = orders.filter((o) => o.status_id === 1);
-  const today = new Date().toISOString().slice(0, 10);
-  const todayPickup = orders.filter((o) =>
-    o.pickup_due_datetime.startsWith(today)
-  );
+  // กราฟสถานะใช้ข้อมูลชุดเดียวกับ summary (อัปเดต live พร้อมกัน)
+  const ordersByStatus = summary.by_status;
 
   return (
     <div style={{ padding: "20px" }}>
@@ -224,6 +265,19 @@ export default function DashboardPage() {
   );
 }
 
+// ==== Live patch helpers ====
+function moveStatusCount(summary, fromId, toId) {
+  const next = { ...summary };
+  next.by_status = summary.by_status.map((row) => {
+    let count = row.count;
+    if (row.status_id === fromId) count -= 1;
+    if (row.status_id === toId) count += 1;
+    if (count !== row.count) next[row.status] = count;
+    return { ...row, count };
+  });
+  return next;
+}
+
 // ==== Card & Table (แบบเดิม) ====
 function Card({ title, value }) {
   return (
@@ -17,6 +17,7 @@ export default function OrderDetailsPage() {
 
   const [order, setOrder] = useState(null);
   const [statuses, setStatuses] = useState([]);
+  const [transitions, setTransitions] = useState({});
 
   // payment form
   const [payAmount, setPayAmount] = useState("");
@@ -26,6 +27,7 @@ export default function OrderDetailsPage() {
   useEffect(() => {
     loadOrder();
     API.getStatuses().then(setStatuses);
+    API.getStatusTransitions().then(setTransitions);
   }, []);
 
   async function loadOrder() {
@@ -38,11 +40,13 @@ export default function OrderDetailsPage() {
     const newStatusId = Number(e.target.value);
 
     try {
-      await API.updateOrderStatus(id, newStatusId);
+      await API.updateOrderStatus(id, newStatusId, order.status.status_id);
       loadOrder();
     } catch (err) {
       console.error("Status update failed:", err);
+      // อาจมีคนเปลี่ยนสถานะไปก่อนแล้ว → โหลดสถานะล่าสุด
       alert("Status update failed!");
+      loadOrder();
     }
   }
 
@@ -76,10 +80,10 @@ export default function OrderDetailsPage() {
 
   if (!order) return <h1>Loading...</h1>;
 
-  // totals
-  const totalAmount = order.items.reduce((s, i) => s + i.amount, 0);
-  const totalPaid = order.payments.reduce((s, p) => s + p.amount, 0);
-  const remaining = totalAmount - totalPaid;
+  // totals (เก็บไว้ใน orders ฝั่ง server แล้ว ไม่ต้องบวกเอง)
+  const totalAmount = order.total_amount;
+  const totalPaid = order.paid_amount;
+  const remaining = order.balance;
 
   const statusName = order.status.status_name;
   const statusColor = statusColors[statusName] || "#6b7280";
@@ -157,11 +161,17 @@ export default function OrderDetailsPage() {
               minWidth: 140,
             }}
           >
-            {statuses.map((s) => (
-              <option key={s.status_id} value={s.status_id}>
-                {s.status_name}
-              </option>
-            ))}
+            {statuses
+              .filter(
+                (s) =>
+                  s.status_id === order.status.status_id ||
+                  (transitions[order.status.status_id] || []).includes(s.status_id)
+              )
+              .map((s) => (
+                <option key={s.status_id} value={s.status_id}>
+                  {s.status_name}
+                </option>
+              ))}
           </select>
         </div>
 
@@ -11,24 +11,90 @@ const statusColors = {
   picked_up: "#7f8c8d",
 };
 
+// วันที่จาก <input type="date"> → ช่วงเวลาที่ API ใช้ (ปลายช่วงไม่รวม)
+const dayStart = (date) => (date ? `${date}T00:00:00` : undefined);
+const dayAfter = (date) => {
+  if (!date) return undefined;
+  const next = new Date(`${date}T00:00:00`);
+  next.setDate(next.getDate() + 1);
+  const pad = (n) => String(n).padStart(2, "0");
+  return `${next.getFullYear()}-${pad(next.getMonth() + 1)}-${pad(next.getDate())}T00:00:00`;
+};
+
 export default function OrdersPage() {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [search, setSearch] = useState("");
+  const [unpaidOnly, setUnpaidOnly] = useState(false);
+  const [statusId, setStatusId] = useState("");
+  const [dropoff, setDropoff] = useState({ from: "", to: "" });
+  const [pickup, setPickup] = useState({ from: "", to: "" });
+  const [statuses, setStatuses] = useState([]);
+  const [selected, setSelected] = useState(new Set());
+  const [target, setTarget] = useState("");
+  const [message, setMessage] = useState("");
+
+  const filters = () => ({
+    q: search,
+    unpaid: unpaidOnly || undefined,
+    status_id: statusId,
+    dropoff_from: dayStart(dropoff.from),
+    dropoff_to: dayAfter(dropoff.to),
+    pickup_from: dayStart(pickup.from),
+    pickup_to: dayAfter(pickup.to),
+  });
+
+  const loadOrders = () =>
+    API.getOrderList(filters())
+      .then(({ rows, nextCursor }) => {
+        setOrders(rows);
+        setNextCursor(nextCursor);
+      })
+      .catch(console.error);
+
+  // หน้าถัดไป ต่อท้ายรายการเดิม
+  const loadMore = () =>
+    API.getOrderList({ ...filters(), cursor: nextCursor })
+      .then(({ rows, nextCursor }) => {
+        setOrders((prev) => [...prev, ...rows]);
+        setNextCursor(nextCursor);
+      })
+      .catch(console.error);
+
+  // ค้นหาฝั่ง server (debounce 300ms)
+  useEffect(() => {
+    const timer = setTimeout(loadOrders, 300);
+    return () => clearTimeout(timer);
+  }, [search, unpaidOnly, statusId, dropoff, pickup]);
 
   useEffect(() => {
-    API.getOrders().then(setOrders).catch(console.error);
+    API.getStatuses().then(setStatuses).catch(console.error);
   }, []);
 
-  // Filter แบบ real-time
-  const filtered = orders.filter((o) => {
-    const t = search.toLowerCase();
-    return (
-      o.customer.full_name.toLowerCase().includes(t) ||
-      o.status.status_name.toLowerCase().includes(t) ||
-      o.dropoff_datetime.includes(t) ||
-      o.pickup_due_datetime.includes(t)
-    );
-  });
+  const toggle = (id) =>
+    setSelected((prev) => {
+      const next = new Set(prev);
+      next.has(id) ? next.delete(id) : next.add(id);
+      return next;
+    });
+
+  // ย้ายทั้งเครื่อง (เช่น 30 ออเดอร์ pending → washing) ใน request เดียว
+  const moveSelected = async () => {
+    if (!target || selected.size === 0) return;
+    try {
+      const res = await API.updateOrderStatusBulk([...selected], Number(target));
+      const skipped = res.results.filter((r) => r.result !== "moved");
+      setMessage(
+        `Moved ${res.moved} order(s)` +
+          (skipped.length ? `, skipped ${skipped.map((r) => `#${r.order_id}`).join(", ")}` : "")
+      );
+      setSelected(new Set(skipped.map((r) => r.order_id)));
+      loadOrders();
+    } catch (err) {
+      setMessage("Bulk update failed, please try again");
+      console.error(err);
+    }
+  };
 
   return (
     <div style={{ padding: "20px" }}>
@@ -38,7 +104,7 @@ export default function OrdersPage() {
       <div style={{ marginBottom: "15px" }}>
         <input
           type="text"
-          placeholder="Search name / status / date..."
+          placeholder="Search name / phone..."
           value={search}
           onChange={(e) => setSearch(e.target.value)}
           style={{
@@ -50,6 +116,71 @@ export default function OrdersPage() {
             color: "#f2f2f7",
           }}
         />
+        <label style={{ marginLeft: "15px", color: "#8f8fa3" }}>
+          <input
+            type="checkbox"
+            checked={unpaidOnly}
+            onChange={(e) => setUnpaidOnly(e.target.checked)}
+          />{" "}
+          Unpaid only
+        </label>
+      </div>
+
+      {/* Filters: status, dropoff / pickup date ranges */}
+      <div style={{ marginBottom: "15px", display: "flex", gap: "15px", alignItems: "center", color: "#8f8fa3" }}>
+        <select value={statusId} onChange={(e) => setStatusId(e.target.value)}>
+          <option value="">All statuses</option>
+          {statuses.map((s) => (
+            <option key={s.status_id} value={s.status_id}>
+              {s.status_name}
+            </option>
+          ))}
+        </select>
+        <span>
+          Dropoff{" "}
+          <input
+            type="date"
+            value={dropoff.from}
+            onChange={(e) => setDropoff({ ...dropoff, from: e.target.value })}
+          />{" "}
+          –{" "}
+          <input
+            type="date"
+            value={dropoff.to}
+            onChange={(e) => setDropoff({ ...dropoff, to: e.target.value })}
+          />
+        </span>
+        <span>
+          Due{" "}
+          <input
+            type="date"
+            value={pickup.from}
+            onChange={(e) => setPickup({ ...pickup, from: e.target.value })}
+          />{" "}
+          –{" "}
+          <input
+            type="date"
+            value={pickup.to}
+            onChange={(e) => setPickup({ ...pickup, to: e.target.value })}
+          />
+        </span>
+      </div>
+
+      {/* Bulk status */}
+      <div style={{ marginBottom: "15px", display: "flex", gap: "10px", alignItems: "center" }}>
+        <span style={{ color: "#8f8fa3" }}>{selected.size} selected</span>
+        <select value={target} onChange={(e) => setTarget(e.target.value)}>
+          <option value="">Move to...</option>
+          {statuses.map((s) => (
+            <option key={s.status_id} value={s.status_id}>
+              {s.status_name}
+            </option>
+          ))}
+        </select>
+        <button onClick={moveSelected} disabled={!target || selected.size === 0}>
+          Move selected
+        </button>
+        {message && <span style={{ color: "#9ca3af" }}>{message}</span>}
       </div>
 
       {/* Table wrapper */}
@@ -65,17 +196,19 @@ export default function OrdersPage() {
         <table className="table">
           <thead>
             <tr style={{ background: "#1c1c27", color: "#8f8fa3" }}>
+              <th></th>
               <th>ID</th>
               <th>Customer</th>
               <th>Status</th>
               <th>Dropoff</th>
               <th>Due</th>
+              <th>Balance</th>
               <th></th>
             </tr>
           </thead>
 
           <tbody>
-            {filtered.map((o) => (
+            {orders.map((o) => (
               <tr
                 key={o.order_id}
                 style={{ transition: "0.15s" }}
@@ -86,6 +219,13 @@ export default function OrdersPage() {
                   (e.currentTarget.style.background = "transparent")
                 }
               >
+                <td>
+                  <input
+                    type="checkbox"
+                    checked={selected.has(o.order_id)}
+                    onChange={() => toggle(o.order_id)}
+                  />
+                </td>
                 <td>{o.order_id}</td>
 
                 {/* Customer Name */}
@@ -117,7 +257,12 @@ export default function OrdersPage() {
 
                 {/* Due */}
                 <td style={{ color: "#9ca3af" }}>
-                  {o.pickup_due_datetime.replace("T", " ")}
+                  {o.pickup_due_datetime?.replace("T", " ")}
+                </td>
+
+                {/* Balance */}
+                <td style={{ color: o.balance > 0 ? "#ff8a3d" : "#9ca3af" }}>
+                  {o.balance} ฿
                 </td>
 
                 {/* View button */}
@@ -136,15 +281,21 @@ export default function OrdersPage() {
               </tr>
             ))}
 
-            {filtered.length === 0 && (
+            {orders.length === 0 && (
               <tr>
-                <td colSpan="6" style={{ padding: 20, textAlign: "center" }}>
+                <td colSpan="8" style={{ padding: 20, textAlign: "center" }}>
                   No orders found.
                 </td>
               </tr>
             )}
           </tbody>
         </table>
+
+        {nextCursor && (
+          <div style={{ textAlign: "center", padding: "10px" }}>
+            <button onClick={loadMore}>Load more</button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,100 @@
+import { useEffect, useState } from "react";
+import { Link } from "react-router-dom";
+import { API } from "../services/api";
+
+const BUCKETS = [
+  { key: "overdue", title: "Overdue", color: "#ff5c5c" },
+  { key: "next_hour", title: "Next hour", color: "#ffb000" },
+  { key: "today", title: "Later today", color: "#409eff" },
+  { key: "tomorrow", title: "Tomorrow", color: "#8f8fa3" },
+];
+
+// คิวรับผ้าสำหรับหน้าเคาน์เตอร์: server แบ่งกลุ่มและนับให้แล้ว
+export default function PickupQueuePage() {
+  const [queue, setQueue] = useState(null);
+
+  useEffect(() => {
+    const load = () => API.getPickupQueue().then(setQueue).catch(console.error);
+    load();
+    // เวลาเดินตลอด: โหลดใหม่ทุกนาที และทุกครั้งที่สถานะออเดอร์เปลี่ยน
+    const timer = setInterval(load, 60_000);
+    const unsubscribe = API.subscribeEvents({
+      order_status: load,
+      order_status_bulk: load,
+      order_created: load,
+      resync: load,
+    });
+    return () => {
+      clearInterval(timer);
+      unsubscribe();
+    };
+  }, []);
+
+  if (!queue) return <h2>Loading pickup queue...</h2>;
+
+  return (
+    <div style={{ padding: "20px" }}>
+      <h1 className="page-title">Pickup Queue</h1>
+
+      <div style={{ display: "flex", gap: "20px", flexWrap: "wrap", marginBottom: "30px" }}>
+        {BUCKETS.map((b) => (
+          <div
+            key={b.key}
+            style={{
+              background: "#15151e",
+              padding: "20px",
+              borderRadius: "10px",
+              border: "1px solid #262631",
+              width: "180px",
+              textAlign: "center",
+            }}
+          >
+            <h4 style={{ marginBottom: 8, color: "#8f95a2" }}>{b.title}</h4>
+            <h2 style={{ margin: 0, color: b.color }}>{queue.counts[b.key]}</h2>
+          </div>
+        ))}
+      </div>
+
+      {BUCKETS.map((b) => (
+        <div key={b.key} style={{ marginBottom: "30px" }}>
+          <h3 style={{ color: b.color }}>
+            {b.title} ({queue.counts[b.key]})
+          </h3>
+          <table className="table">
+            <thead>
+              <tr>
+                <th>Order #</th>
+                <th>Customer</th>
+                <th>Phone</th>
+                <th>Status</th>
+                <th>Due</th>
+                <th>Balance</th>
+              </tr>
+            </thead>
+            <tbody>
+              {queue.buckets[b.key].map((o) => (
+                <tr key={o.order_id}>
+                  <td>
+                    <Link to={`/orders/${o.order_id}`}>{o.order_id}</Link>
+                  </td>
+                  <td>{o.customer.full_name}</td>
+                  <td>{o.customer.phone}</td>
+                  <td>{o.status.status_name}</td>
+                  <td>{o.pickup_due_datetime.replace("T", " ").slice(0, 16)}</td>
+                  <td>{o.balance} ฿</td>
+                </tr>
+              ))}
+              {queue.buckets[b.key].length === 0 && (
+                <tr>
+                  <td colSpan="6" style={{ textAlign: "center" }}>
+                    Nothing due.
+                  </td>
+                </tr>
+              )}
+            </tbody>
+          </table>
+        </div>
+      ))}
+    </div>
+  );
+}
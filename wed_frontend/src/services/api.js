@@ -1,47 +1,127 @@
 const API_BASE = "http://127.0.0.1:8000";
 
+// Build "?a=1&b=2" from an object, skipping empty values.
+function toQuery(params = {}) {
+  const qs = new URLSearchParams(
+    Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== "")
+  ).toString();
+  return qs ? `?${qs}` : "";
+}
+
+// Read-your-writes: after a write the API may answer with X-DB-Pin (when it
+// reads from replicas). Sending it back on reads until it runs out keeps
+// them on the primary, so the page shows what was just saved.
+let dbPin = null;
+
+function rememberPin(res) {
+  const pin = res.headers.get("X-DB-Pin");
+  if (pin) dbPin = pin;
+}
+
+function pinHeaders() {
+  return dbPin && Date.now() / 1000 < Number(dbPin) ? { "X-DB-Pin": dbPin } : {};
+}
+
+// The branch every request works on (X-Branch-Id); kept per browser. The
+// API answers only with that branch's customers, orders, payments, stats.
+const BRANCH_KEY = "branch_id";
+
+function getBranchId() {
+  return localStorage.getItem(BRANCH_KEY) || "1";
+}
+
+function setBranchId(branchId) {
+  localStorage.setItem(BRANCH_KEY, String(branchId));
+}
+
+function branchHeaders() {
+  return { "X-Branch-Id": getBranchId() };
+}
+
 async function apiGet(path) {
-  const res = await fetch(API_BASE + path);
+  const res = await fetch(API_BASE + path, { headers: { ...branchHeaders(), ...pinHeaders() } });
   if (!res.ok) throw new Error(`GET ${path} failed`);
   return res.json();
 }
 
+// List endpoints return one page; the cursor for the next one comes in the
+// X-Next-Cursor header (absent on the last page).
+async function apiGetPage(path) {
+  const res = await fetch(API_BASE + path, { headers: { ...branchHeaders(), ...pinHeaders() } });
+  if (!res.ok) throw new Error(`GET ${path} failed`);
+  return { rows: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
+}
+
 async function apiPost(path, payload) {
   const res = await fetch(API_BASE + path, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", ...branchHeaders() },
     body: JSON.stringify(payload),
   });
   if (!res.ok) throw new Error(`POST ${path} failed`);
+  rememberPin(res);
   return res.json();
 }
 
 async function apiPut(path, payload) {
   const res = await fetch(API_BASE + path, {
     method: "PUT",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", ...branchHeaders() },
     body: JSON.stringify(payload),
   });
   if (!res.ok) throw new Error(`PUT ${path} failed`);
+  rememberPin(res);
   return res.json();
 }
 
+// Live change feed (Server-Sent Events). handlers: { eventName: (data) => ... }
+// Returns a function that closes the connection. EventSource cannot send
+// headers, so the branch goes in the query string.
+function subscribeEvents(handlers) {
+  const source = new EventSource(API_BASE + "/events" + toQuery({ branch_id: getBranchId() }));
+  for (const [name, handler] of Object.entries(handlers)) {
+    source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+  }
+  return () => source.close();
+}
+
+// Columns the order tables render; the API skips the rest (items, payments...).
+const ORDER_LIST_FIELDS =
+  "order_id,dropoff_datetime,pickup_due_datetime,balance,customer.full_name,status.status_name";
+
 export const API = {
+  // branches
+  getBranches: () => apiGet("/branches"),
+  getBranchId,
+  setBranchId,
+
   // customers
-  getCustomers: () => apiGet("/customers"),
+  getCustomers: (params) => apiGet("/customers" + toQuery(params)),
+  searchCustomers: (q) => apiGet("/customers/search" + toQuery({ q })),
   addCustomer: (data) => apiPost("/customers", data),
 
   // services & statuses
   getServices: () => apiGet("/services"),
   getStatuses: () => apiGet("/statuses"),
+  getStatusTransitions: () => apiGet("/statuses/transitions"),
 
   // orders
-  getOrders: () => apiGet("/orders"),
+  getOrders: (params) => apiGet("/orders" + toQuery(params)),
+  // { rows, nextCursor }: pass nextCursor back as `cursor` for the next page
+  getOrderList: (params) => apiGetPage("/orders" + toQuery({ fields: ORDER_LIST_FIELDS, ...params })),
   getOrder: (id) => apiGet(`/orders/${id}`),
+  // overdue / next_hour / today / tomorrow, with counts
+  getPickupQueue: (limit) => apiGet("/orders/pickup_queue" + toQuery({ limit })),
   addOrder: (data) => apiPost("/orders", data),
+  addOrderFull: (data) => apiPost("/orders/full", data),
 
-  updateOrderStatus: (id, status_id) =>
-    apiPut(`/orders/${id}/status`, { status_id }),
+  // expected_status_id: the status shown on screen; the API answers 409 if
+  // someone else changed it first
+  updateOrderStatus: (id, status_id, expected_status_id) =>
+    apiPut(`/orders/${id}/status`, { status_id, expected_status_id }),
+  // a whole machine load; the reply lists moved / invalid_transition / not_found
+  updateOrderStatusBulk: (order_ids, status_id) =>
+    apiPut("/orders/status", { order_ids, status_id }),
 
   // payments
   addPayment: (data) => apiPost("/payments", data),
@@ -53,4 +133,7 @@ export const API = {
   getSummary: () => apiGet("/stats/summary"),
   getOrdersByStatus: () => apiGet("/stats/orders_by_status"),
   getRevenue7Days: () => apiGet("/stats/revenue_7_days"),
+  getDashboard: () => apiGet("/summary/dashboard"),
+
+  subscribeEvents,
 };